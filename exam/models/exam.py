@@ -2,6 +2,7 @@
 
 from odoo import _, api, fields, models
 from odoo.exceptions import ValidationError
+from odoo.tools.sql import create_index
 
 
 class StudentStudent(models.Model):
@@ -97,36 +98,12 @@ class ExtendedTimeTable(models.Model):
     @api.constrains("exam_timetable_line_ids")
     def _check_exam(self):
         """Method to check same exam is not assigned on same day."""
-        if self.timetable_type == "exam":
-            if not self.exam_timetable_line_ids:
-                raise ValidationError(_("Please Enter Exam Timetable!"))
-            line_ids = self.env["time.table.line"].search(
-                [("table_id", "in", self.ids)]
-            )
-            for rec in line_ids:
-                records = [
-                    rec_check.id
-                    for rec_check in line_ids
-                    if (
-                        rec.day_of_week == rec_check.day_of_week
-                        and rec.start_time == rec_check.start_time
-                        and rec.end_time == rec_check.end_time
-                        and rec.teacher_id.id == rec.teacher_id.id
-                        and rec.exm_date == rec.exm_date
-                    )
-                ]
-                if len(records) > 1:
-                    raise ValidationError(
-                        _(
-                            "You cannot set exam at same time %s  at same day"
-                            " %s for teacher %s!"
-                        )
-                        % (
-                            rec.start_time,
-                            rec.day_of_week,
-                            rec.teacher_id.name,
-                        )
-                    )
+        for rec in self:
+            if rec.timetable_type == "exam":
+                if not rec.exam_timetable_line_ids:
+                    raise ValidationError(_("Please Enter Exam Timetable!"))
+        exam_tables = self.filtered(lambda t: t.timetable_type == "exam")
+        exam_tables.mapped("exam_timetable_line_ids")._check_exam_conflicts()
 
 
 class ExtendedTimeTableLine(models.Model):
@@ -183,61 +160,140 @@ class ExtendedTimeTableLine(models.Model):
                     _("Start and End Time should be less than 24 hours!")
                 )
 
-    @api.constrains("teacher_id", "class_room_id", "exm_date", "start_time")
-    def check_teacher_room(self):
-        """Method to Check room."""
-        for rec in self:
-            for data in self.env["time.table"].search(
-                [("id", "!=", rec.table_id.id)]
-            ):
-                for record in data.timetable_ids:
-                    if (
-                        data.timetable_type == "exam"
-                        and rec.table_id.timetable_type == "exam"
-                        and rec.class_room_id == record.class_room_id
-                        and rec.start_time == record.start_time
-                        and rec.exm_date == record.exm_date
-                    ):
-                        raise ValidationError(_("The room is occupied!"))
-
-    @api.constrains("subject_id", "class_room_id")
-    def check_exam_date(self):
-        """Method to Check Exam Date."""
-        for rec in self.table_id.exam_timetable_line_ids:
-            record = self.table_id
-            if rec.id not in self.ids:
-                if (
-                    record.timetable_type == "exam"
-                    and self.exm_date == rec.exm_date
-                    and self.start_time == rec.start_time
-                ):
-                    raise ValidationError(
-                        _("There is already Exam at same Date and Time!")
-                    )
-                if (
-                    record.timetable_type == "exam"
-                    and self.table_id.timetable_type == "exam"
-                    and self.subject_id == rec.subject_id
-                ):
-                    raise ValidationError(
-                        _("%s Subject Exam Already Taken")
-                        % (self.subject_id.name)
-                    )
-                if (
-                    record.timetable_type == "exam"
-                    and self.table_id.timetable_type == "exam"
-                    and self.exm_date == rec.exm_date
-                    and self.class_room_id == rec.class_room_id
-                    and self.start_time == rec.start_time
-                ):
-                    raise ValidationError(
-                        _("%s is occupied by '%s' for %s class!")
-                        % (
-                            self.class_room_id.name,
-                            record.name,
-                            record.standard_id.standard_id.name,
-                        )
+    def init(self):
+        """Create the slot occupancy indexes used by exam conflict checks"""
+        super(ExtendedTimeTableLine, self).init()
+        create_index(
+            self._cr,
+            "time_table_line_exam_teacher_slot_index",
+            self._table,
+            ["exm_date", "start_time", "teacher_id"],
+        )
+        create_index(
+            self._cr,
+            "time_table_line_exam_room_slot_index",
+            self._table,
+            ["exm_date", "start_time", "class_room_id"],
+        )
+
+    def _get_exam_conflicts(self):
+        """Return every exam slot conflict involving the current lines.
+
+        Exam lines are grouped on (date, start, teacher), (date, start, room)
+        and (date, start, timetable), and subjects on (timetable, subject),
+        in one query. Each conflict is a dict holding its ``type`` and the
+        ids of the clashing ``line_ids``.
+        """
+        if not self.ids:
+            return []
+        self.flush(
+            [
+                "table_id",
+                "exm_date",
+                "start_time",
+                "teacher_id",
+                "class_room_id",
+                "subject_id",
+            ]
+        )
+        self.env["time.table"].flush(["timetable_type"])
+        self._cr.execute(
+            """
+            SELECT
+                GROUPING(l.teacher_id),
+                GROUPING(l.class_room_id),
+                GROUPING(l.exm_date),
+                ARRAY_AGG(l.id ORDER BY l.id)
+            FROM
+                time_table_line l
+                JOIN time_table t ON t.id = l.table_id
+            WHERE
+                t.timetable_type = 'exam' AND
+                ((l.exm_date, l.start_time) IN (
+                    SELECT exm_date, start_time
+                    FROM time_table_line
+                    WHERE id IN %(ids)s
+                ) OR l.table_id IN (
+                    SELECT table_id
+                    FROM time_table_line
+                    WHERE id IN %(ids)s
+                ))
+            GROUP BY GROUPING SETS (
+                (l.exm_date, l.start_time, l.teacher_id),
+                (l.exm_date, l.start_time, l.class_room_id),
+                (l.exm_date, l.start_time, l.table_id),
+                (l.table_id, l.subject_id)
+            )
+            HAVING
+                COUNT(*) > 1 AND
+                BOOL_OR(l.id IN %(ids)s) AND
+                (GROUPING(l.exm_date) = 1 OR l.exm_date IS NOT NULL) AND
+                (GROUPING(l.teacher_id) = 1 OR l.teacher_id IS NOT NULL) AND
+                (GROUPING(l.class_room_id) = 1 OR
+                 l.class_room_id IS NOT NULL) AND
+                (GROUPING(l.subject_id) = 1 OR l.subject_id IS NOT NULL)
+            """,
+            {"ids": tuple(self.ids)},
+        )
+        conflicts = []
+        for no_teacher, no_room, no_date, line_ids in self._cr.fetchall():
+            if no_date:
+                conflict_type = "subject"
+            elif not no_teacher:
+                conflict_type = "teacher"
+            elif not no_room:
+                conflict_type = "room"
+            else:
+                conflict_type = "slot"
+            conflicts.append({"type": conflict_type, "line_ids": line_ids})
+        return conflicts
+
+    def _check_exam_conflicts(self):
+        """Raise one error listing all exam conflicts of the lines"""
+        messages = []
+        for conflict in self._get_exam_conflicts():
+            lines = self.browse(conflict["line_ids"])
+            line = lines[0]
+            if conflict["type"] == "teacher":
+                messages.append(
+                    _("Supervisor %s has exams at same time %s on %s!")
+                    % (line.teacher_id.name, line.start_time, line.exm_date)
+                )
+            elif conflict["type"] == "room":
+                messages.append(
+                    _("%s is occupied by %s at %s on %s!")
+                    % (
+                        line.class_room_id.name,
+                        ", ".join(lines.mapped("table_id.name")),
+                        line.start_time,
+                        line.exm_date,
                     )
+                )
+            elif conflict["type"] == "slot":
+                messages.append(
+                    _("There is already Exam at same Date and Time! (%s)")
+                    % (line.table_id.name)
+                )
+            else:
+                messages.append(
+                    _("%s Subject Exam Already Taken") % (line.subject_id.name)
+                )
+        if messages:
+            raise ValidationError("\n".join(messages))
+
+    @api.constrains(
+        "teacher_id",
+        "class_room_id",
+        "exm_date",
+        "week_day",
+        "start_time",
+        "end_time",
+        "subject_id",
+    )
+    def check_teacher_room(self):
+        """Method to Check room, supervisor and subject conflicts."""
+        super(ExtendedTimeTableLine, self).check_teacher_room()
+        self._check_exam_conflicts()
 
 
 class ExamExam(models.Model):
@@ -254,16 +310,33 @@ class ExamExam(models.Model):
                 raise ValidationError(
                     _("Exam end date should be greater than start date!")
                 )
-            for line in rec.exam_schedule_ids:
-                if line.timetable_id:
-                    for tt in line.timetable_id.exam_timetable_line_ids:
-                        if not rec.start_date <= tt.exm_date <= rec.end_date:
-                            raise ValidationError(
-                                _(
-                                    "Invalid Exam Schedule! Exam Dates must"
-                                    " be in between Start date and End date!"
-                                )
-                            )
+        if not self.ids:
+            return
+        self.flush(["start_date", "end_date"])
+        self.env["exam.schedule.line"].flush(["exam_id", "timetable_id"])
+        self.env["time.table.line"].flush(["table_id", "exm_date"])
+        self._cr.execute(
+            """
+            SELECT
+                e.id
+            FROM
+                exam_exam e
+                JOIN exam_schedule_line s ON s.exam_id = e.id
+                JOIN time_table_line l ON l.table_id = s.timetable_id
+            WHERE
+                e.id IN %s AND
+                (l.exm_date < e.start_date OR l.exm_date > e.end_date)
+            LIMIT 1
+            """,
+            (tuple(self.ids),),
+        )
+        if self._cr.fetchone():
+            raise ValidationError(
+                _(
+                    "Invalid Exam Schedule! Exam Dates must"
+                    " be in between Start date and End date!"
+                )
+            )
 
     @api.constrains("active")
     def check_active(self):
@@ -648,46 +721,79 @@ class ExamResult(models.Model):
             self.standard_id = self.student_id.standard_id.id or False
             self.roll_no = self.student_id.roll_no or False
 
-    def result_confirm(self):
-        """Method to confirm result"""
-        for rec in self:
-            for line in rec.result_ids:
-                if line.maximum_marks == 0:
-                    # Check subject marks not greater than maximum marks
-                    raise ValidationError(
-                        _('Kindly add maximum marks of subject "%s".')
-                        % (line.subject_id.name)
-                    )
-                elif line.minimum_marks == 0:
-                    raise ValidationError(
-                        _('Kindly add minimum marks of subject "%s".')
-                        % (line.subject_id.name)
-                    )
-                elif (
-                    line.maximum_marks == 0 or line.minimum_marks == 0
-                ) and line.obtain_marks:
-                    raise ValidationError(
-                        _('Kindly add marks details of subject "%s"!')
-                        % (line.subject_id.name)
-                    )
-            rec.write(
-                {
-                    "grade": rec.grade,
-                    "percentage": rec.percentage,
-                    "state": "confirm",
-                }
+    def _check_result_marks(self):
+        """Validate subject marks of all selected results with one query"""
+        if not self.ids:
+            return
+        self.env["exam.subject"].flush(
+            ["exam_id", "subject_id", "maximum_marks", "minimum_marks"]
+        )
+        self._cr.execute(
+            """
+            SELECT
+                es.subject_id,
+                COALESCE(es.maximum_marks, 0) = 0
+            FROM
+                exam_subject es
+            WHERE
+                es.exam_id IN %s AND
+                (COALESCE(es.maximum_marks, 0) = 0 OR
+                 COALESCE(es.minimum_marks, 0) = 0)
+            ORDER BY es.exam_id, es.id
+            LIMIT 1
+            """,
+            (tuple(self.ids),),
+        )
+        invalid = self._cr.fetchone()
+        if invalid:
+            subject = self.env["subject.subject"].browse(invalid[0])
+            if invalid[1]:
+                # Check subject marks not greater than maximum marks
+                raise ValidationError(
+                    _('Kindly add maximum marks of subject "%s".')
+                    % (subject.name)
+                )
+            raise ValidationError(
+                _('Kindly add minimum marks of subject "%s".')
+                % (subject.name)
             )
 
+    def result_confirm(self):
+        """Method to confirm all selected results in one batch"""
+        if self.filtered(lambda result: result.state != "draft"):
+            raise ValidationError(_("Only draft results can be confirmed!"))
+        self._check_result_marks()
+        self.write({"state": "confirm"})
+
     def re_evaluation_confirm(self):
         """Method to change state to re_evaluation_confirm"""
-        self.state = "re-evaluation_confirm"
+        self.write({"state": "re-evaluation_confirm"})
 
     def result_re_evaluation(self):
         """Method to set state to re-evaluation"""
-        for rec in self:
-            for line in rec.result_ids:
-                line.marks_reeval = line.obtain_marks
-            rec.state = "re-evaluation"
+        if self.filtered(
+            lambda result: result.state
+            not in ("confirm", "re-access", "re-access_confirm")
+        ):
+            raise ValidationError(
+                _("Only confirmed results can be sent to re-evaluation!")
+            )
+        subject_lines = self.mapped("result_ids")
+        if subject_lines:
+            subject_lines.flush(["obtain_marks"])
+            # Copy marks of every subject line in one statement, then let
+            # the ORM recompute totals once the state switch is written.
+            self._cr.execute(
+                """
+                UPDATE exam_subject
+                SET marks_reeval = obtain_marks
+                WHERE id IN %s
+                """,
+                (tuple(subject_lines.ids),),
+            )
+            subject_lines.invalidate_cache(["marks_reeval"])
+            subject_lines.modified(["marks_reeval"])
+        self.write({"state": "re-evaluation"})
 
 
 class ExamGradeLine(models.Model):
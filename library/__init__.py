@@ -4,5 +4,6 @@
 # A Module to School Library Management System
 # ----------------------------------------------------------
 
+from . import controllers
 from . import models
 from . import wizard
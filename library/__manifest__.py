@@ -2,7 +2,7 @@
 
 {
     "name": "Library Management for Education ERP",
-    "version": "15.0.1.0.0",
+    "version": "15.0.1.0.1",
     "author": "Serpent Consulting Services Pvt. Ltd.",
     "category": "School Management",
     "website": "http://www.serpentcs.com",
@@ -14,13 +14,16 @@
         "data/library_sequence.xml",
         "data/library_category_data.xml",
         "data/library_card_schedular.xml",
+        "data/library_card_mail_template.xml",
         "security/library_security.xml",
         "security/ir.model.access.csv",
         'views/card_details.xml',
         "report/report_view.xml",
         "report/qrcode_label.xml",
         "views/library_view.xml",
+        "views/library_circulation_view.xml",
         "wizard/terminate_reason.xml",
+        "wizard/bulk_checkout_view.xml",
     ],
     "demo": ["demo/library_demo.xml"],
     "image": ["static/description/SchoolLibrary.png"],
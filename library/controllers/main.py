@@ -0,0 +1,68 @@
+# See LICENSE file for full copyright and licensing details.
+
+import io
+import mimetypes
+import os
+
+from werkzeug.exceptions import Forbidden, NotFound
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import wrap_file
+
+from odoo import http
+from odoo.exceptions import AccessError
+from odoo.http import content_disposition, request
+
+from ..models.library import EBOOK_STATES
+
+
+class LibraryEbook(http.Controller):
+    @http.route("/library/ebook/<int:issue_id>", type="http", auth="user")
+    def ebook_download(self, issue_id, **kwargs):
+        """Stream the e-book of a paid or subscribed book issue.
+
+        The file is read from the single attachment of the book, range
+        requests are answered so readers can resume and seek in large
+        books.
+        """
+        issue = request.env["library.book.issue"].browse(issue_id).exists()
+        if not issue:
+            raise NotFound()
+        try:
+            issue.check_access_rights("read")
+            issue.check_access_rule("read")
+        except AccessError:
+            raise Forbidden()
+        if issue.state not in EBOOK_STATES:
+            raise Forbidden()
+        attachment = issue._get_ebook_attachment()
+        if not attachment:
+            raise NotFound()
+        if attachment.store_fname:
+            path = attachment._full_path(attachment.store_fname)
+            try:
+                size = os.path.getsize(path)
+                stream = open(path, "rb")
+            except OSError:
+                raise NotFound()
+        else:
+            size = attachment.file_size
+            stream = io.BytesIO(attachment.raw or b"")
+        mimetype = attachment.mimetype or "application/octet-stream"
+        response = Response(
+            wrap_file(request.httprequest.environ, stream),
+            mimetype=mimetype,
+            direct_passthrough=True,
+        )
+        response.headers["Content-Length"] = size
+        response.headers["Content-Disposition"] = content_disposition(
+            "%s%s"
+            % (issue.name.name, mimetypes.guess_extension(mimetype) or "")
+        )
+        response.headers["Cache-Control"] = "private, max-age=0"
+        response.set_etag(attachment.checksum or str(attachment.id))
+        response.last_modified = attachment.write_date
+        return response.make_conditional(
+            request.httprequest.environ,
+            accept_ranges=True,
+            complete_length=size,
+        )
@@ -0,0 +1,20 @@
+# See LICENSE file for full copyright and licensing details.
+
+from odoo import SUPERUSER_ID, api
+
+
+def migrate(cr, version):
+    """Remove the e-book copies once stored on the book issues.
+
+    The attachments are unlinked through the ORM so their files are
+    garbage collected from the filestore.
+    """
+    if not version:
+        return
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env["ir.attachment"].search(
+        [
+            ("res_model", "=", "library.book.issue"),
+            ("res_field", "=", "ebook_download"),
+        ]
+    ).unlink()
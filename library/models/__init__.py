@@ -5,3 +5,4 @@ from . import library_editor_supplier
 from . import library
 from . import product
 from . import stock
+from . import library_circulation
@@ -17,6 +17,23 @@ class AccountMove(models.Model):
         help="Select book issue")
     book_issue_reference = fields.Char("Book Issue Ref",
         help="Enter book issue reference")
+    book_issue_ids = fields.Many2many("library.book.issue",
+        "library_book_issue_move_rel", "move_id", "issue_id",
+        "Book Issues", help="Book issues invoiced")
+
+    def _sync_school_payments(self):
+        """Clear penalties of the book issues whose fine is paid"""
+        res = super(AccountMove, self)._sync_school_payments()
+        paid_invoices = self.filtered(
+            lambda invoice: (invoice.book_issue_id or invoice.book_issue_ids)
+            and invoice.payment_state in ("paid", "in_payment"))
+        (paid_invoices.mapped("book_issue_id") |
+         paid_invoices.mapped("book_issue_ids")).write({
+            "penalty": 0.00,
+            "lost_penalty": 0.00,
+            "state": "paid",
+        })
+        return res
 
 
 class AccountMoveLine(models.Model):
@@ -26,22 +43,3 @@ class AccountMoveLine(models.Model):
     production_lot_id = fields.Many2one("stock.production.lot",
                             "Production Lot", help="Select Production lot")
     customer_ref = fields.Char("Customer reference", help="Customer reference")
-
-
-class AccountPaymentRegister(models.TransientModel):
-    _inherit = "account.payment.register"
-
-    def action_create_payments(self):
-        """
-            Override method to write paid amount in hostel student
-        """
-        res = super(AccountPaymentRegister, self).action_create_payments()
-        invoice = False
-        for rec in self:
-            if self._context.get('active_model') == 'account.move':
-                invoice = self.env['account.move'].browse(self._context.get('active_ids', []))
-            if invoice.book_issue_id and invoice.payment_state == "paid":
-                invoice.book_issue_id.penalty = 0.00
-                invoice.book_issue_id.lost_penalty = 0.00
-                invoice.book_issue_id.state = "paid"
-        return res
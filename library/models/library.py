@@ -1,9 +1,19 @@
 # See LICENSE file for full copyright and licensing details.
 
+import logging
+from collections import defaultdict
+
 from dateutil.relativedelta import relativedelta as rd
 
 from odoo import _, api, fields, models
 from odoo.exceptions import ValidationError as UserError
+from odoo.tools.sql import create_index
+
+_logger = logging.getLogger(__name__)
+
+# States of a book issue in which the book is out of the library
+ISSUED_STATES = ("issue", "reissue")
+EBOOK_STATES = ("paid", "subscribe")
 
 
 class LibraryBookShelf(models.Model):
@@ -92,10 +102,13 @@ class LibraryCard(models.Model):
         Returns:
             number: return the number of book issued.
         """
+        counts = {}
+        if self.ids:
+            counts = {line["card_id"][0]: line["card_id_count"]
+                for line in self.env["library.book.issue"].read_group(
+                    [("card_id", "in", self.ids)], ["card_id"], ["card_id"])}
         for rec in self:
-            rec.book_issue_count = self.env['library.book.issue'].search_count([
-                ("card_id", "=", self.id)
-            ])
+            rec.book_issue_count = counts.get(rec.id, 0)
 
     code = fields.Char("Card No", required=True, default=lambda self: _("New"),
         help="Enter card number")
@@ -123,6 +136,9 @@ class LibraryCard(models.Model):
         help="Activate/deactivate record")
     book_issue_count = fields.Integer(compute="compute_book_issue_count",
                                       string="Book Issue Count")
+    expiry_reminder_sent = fields.Boolean("Expiry Reminder Sent",
+        readonly=True, copy=False,
+        help="The holder was reminded of the card expiry")
 
     @api.onchange("student_id")
     def on_change_student(self):
@@ -153,6 +169,8 @@ class LibraryCard(models.Model):
         """Inherited this method to update student values at record updation"""
         if vals.get("student_id"):
             self._update_student_info(vals)
+        if "start_date" in vals or "duration" in vals:
+            vals["expiry_reminder_sent"] = False
         return super(LibraryCard, self).write(vals)
 
     @api.constrains("student_id", "teacher_id")
@@ -191,13 +209,103 @@ class LibraryCard(models.Model):
                     """You cannot delete a confirmed library card!"""))
         return super(LibraryCard, self).unlink()
 
-    def librarycard_expire(self):
-        """Schedular to change in librarycard state when end date is over"""
-        current_date = fields.Datetime.today()
-        library_card_obj = self.env["library.card"]
-        for rec in library_card_obj.search(
-                [("end_date", "<", current_date)]):
-            rec.state = "expire"
+    def init(self):
+        """Create the index used to pick the cards to expire"""
+        self._cr.execute("""
+            CREATE INDEX IF NOT EXISTS library_card_expire_end_date_index
+            ON library_card (end_date) WHERE state != 'expire'""")
+
+    def _send_expiry_reminder(self):
+        """Queue the expiry reminders of the cards to their holders"""
+        template = self.env.ref("library.library_card_expiry_email",
+                                raise_if_not_found=False)
+        if not template or not self:
+            return
+        template = template.sudo()
+        subjects = template._render_field("subject", self.ids)
+        bodies = template._render_field("body_html", self.ids)
+        email_from = self.env.user.email or ""
+        mail_vals_list = []
+        for rec in self:
+            email = (rec.student_id.email if rec.user == "student"
+                     else rec.teacher_id.work_email)
+            if email:
+                mail_vals_list.append({
+                    "subject": subjects[rec.id],
+                    "body_html": bodies[rec.id],
+                    "email_from": email_from,
+                    "email_to": email,
+                    "model": self._name,
+                    "res_id": rec.id,
+                    "auto_delete": True})
+        self.env["mail.mail"].sudo().create(mail_vals_list)
+        self.write({"expiry_reminder_sent": True})
+
+    @api.model
+    def librarycard_expire(self, reminder_days=7):
+        """Schedular to expire the library cards whose end date is over.
+
+        Cards are expired with one statement and the holders of the cards
+        expiring within the reminder days are reminded in the same run.
+        """
+        current_date = fields.Date.today()
+        self.flush(["state", "end_date"])
+        self._cr.execute("""
+            UPDATE library_card
+            SET state = 'expire', write_uid = %s, write_date = NOW()
+            WHERE state != 'expire' AND end_date < %s
+            RETURNING id""", (self.env.uid, current_date))
+        expired_ids = [row[0] for row in self._cr.fetchall()]
+        if expired_ids:
+            expired = self.browse(expired_ids)
+            expired.invalidate_cache(["state", "write_uid", "write_date"])
+            expired.modified(["state"])
+        _logger.info("Expired %s library cards", len(expired_ids))
+        self.flush(["expiry_reminder_sent"])
+        self._cr.execute("""
+            SELECT id FROM library_card
+            WHERE state = 'running' AND end_date >= %s AND end_date <= %s
+                AND expiry_reminder_sent IS NOT TRUE""",
+            (current_date, current_date + rd(days=reminder_days)))
+        self.browse([row[0] for row in self._cr.fetchall()]
+                    )._send_expiry_reminder()
+        return len(expired_ids)
+
+    def _get_borrower_status(self):
+        """Return the borrower status of the cards with one query.
+
+        The status of a card holds the number of issued books, the issue
+        numbers of the unpaid fines, the open issues per book and whether
+        the card is valid today.
+        """
+        today = fields.Date.today()
+        status = {
+            rec.id: {
+                "issued": 0,
+                "fines": [],
+                "books": {},
+                "valid": rec.state != "expire" and not (
+                    rec.end_date and rec.end_date < today),
+            } for rec in self}
+        if not self.ids:
+            return status
+        self.env["library.book.issue"].flush(["card_id", "name", "state",
+                                              "issue_code"])
+        self._cr.execute("""
+            SELECT card_id, name,
+                COUNT(*) FILTER (WHERE state IN ('issue', 'reissue')),
+                COUNT(*) FILTER (
+                    WHERE state NOT IN ('draft', 'cancel', 'return', 'paid')),
+                ARRAY_AGG(issue_code) FILTER (WHERE state = 'fine')
+            FROM library_book_issue
+            WHERE card_id IN %s
+            GROUP BY card_id, name""", (tuple(self.ids),))
+        for card_id, book_id, issued, opened, fines in self._cr.fetchall():
+            card_status = status[card_id]
+            card_status["issued"] += issued
+            card_status["books"][book_id] = opened
+            card_status["fines"] += fines or []
+        return status
 
     #action view book issue
     def action_view_book_issue(self):
@@ -236,15 +344,22 @@ class LibraryBookIssue(models.Model):
                   and penalty as value"""
         for line in self:
             if line.date_return:
-                start_day = line.date_return
-                end_day = line.actual_return_date
                 line.penalty = 0.0
-                if start_day and end_day and start_day < end_day:
-                    diff = rd(end_day.date(), start_day.date())
-                    day = float(diff.days) or 0.0
+                day = line._get_late_days(line.actual_return_date)
+                if line.day_to_return_book:
+                    line.penalty = day * line.name.fine_late_return or 0.0
 
-                    if line.day_to_return_book:
-                        line.penalty = day * line.name.fine_late_return or 0.0
+    def _get_late_days(self, end_date):
+        """Return the days the book is returned late at the end date.
+
+        The overdue fines schedular computes the same day difference in
+        SQL, keep both in line.
+        """
+        self.ensure_one()
+        if not (self.date_return and end_date and
+                self.date_return < end_date):
+            return 0
+        return (end_date.date() - self.date_return.date()).days
 
     @api.depends("state")
     def _compute_lost_penalty(self):
@@ -265,18 +380,9 @@ class LibraryBookIssue(models.Model):
 
     @api.depends("actual_return_date", "date_return")
     def calculate_return_daley_days(self):
-        self.return_daley_days = 0
         for rec in self:
-            if rec.actual_return_date and  rec.date_return and\
-                rec.actual_return_date > rec.date_return:
-                rec.return_daley_days = (
-                    rec.actual_return_date.date() - rec.date_return.date()
-                    ).days
-            elif rec.date_return and not rec.actual_return_date and\
-                rec.date_return < fields.datetime.now():
-                rec.return_daley_days = (
-                    fields.datetime.now().date()- rec.date_return.date()
-                    ).days
+            rec.return_daley_days = rec._get_late_days(
+                rec.actual_return_date or fields.datetime.now())
 
     name = fields.Many2one("product.product", "Book Name", required=True,
         help="Enter book name")
@@ -325,11 +431,71 @@ class LibraryBookIssue(models.Model):
         help="Enter Bank Teller No.")
     bank_teller_amt = fields.Float("Bank Teller Amount",
         help="Enter Bank Teller amount")
-    ebook_download = fields.Binary("Download Book", help="Download Book")
     ebook_check = fields.Boolean("Check Ebook",
         compute="_compute_check_ebook", help="Activate for ebook")
     return_daley_days = fields.Integer(compute="calculate_return_daley_days",
-                                string="Return Daley(In days)")
+                                string="Return Daley(In days)", store=True)
+
+    def init(self):
+        """Create the index used to pick the overdue book issues"""
+        self._cr.execute("""
+            CREATE INDEX IF NOT EXISTS library_book_issue_overdue_index
+            ON library_book_issue (date_return)
+            WHERE state IN ('issue', 'reissue')""")
+
+    def _get_ebook_attachment(self):
+        """Return the e-book file of the issue if it can be downloaded"""
+        self.ensure_one()
+        if self.state not in EBOOK_STATES or not self.name.is_ebook:
+            return self.env["ir.attachment"]
+        return self.env["ir.attachment"].sudo().search([
+            ("res_model", "=", "product.product"),
+            ("res_field", "=", "attach_ebook"),
+            ("res_id", "=", self.name.id)], limit=1)
+
+    def action_download_ebook(self):
+        """Method to download the e-book of the issue"""
+        self.ensure_one()
+        return {
+            "type": "ir.actions.act_url",
+            "url": "/library/ebook/%s" % (self.id),
+            "target": "new",
+        }
+
+    @api.model
+    def _cron_accrue_overdue_fines(self):
+        """Schedular to accrue the delay and fine of the overdue books.
+
+        Delay days and late return penalty of all issued books past their
+        return date are updated with one statement, so overdue lists and
+        fines are read from stored values. Late days are counted as in
+        _get_late_days, so the fine matches the one computed at return.
+        """
+        now = fields.Datetime.now()
+        self.flush(["state", "date_return", "day_to_return_book", "name"])
+        self.env["product.product"].flush(["fine_late_return"])
+        self._cr.execute("""
+            UPDATE library_book_issue issue
+            SET return_daley_days = %(today)s - issue.date_return::date,
+                penalty = CASE WHEN COALESCE(issue.day_to_return_book, 0) != 0
+                    THEN (%(today)s - issue.date_return::date) *
+                        COALESCE(book.fine_late_return, 0)
+                    ELSE 0 END,
+                write_uid = %(uid)s,
+                write_date = NOW()
+            FROM product_product book
+            WHERE book.id = issue.name
+                AND issue.state IN ('issue', 'reissue')
+                AND issue.date_return < %(now)s
+            RETURNING issue.id""", {
+                "today": now.date(),
+                "now": now,
+                "uid": self.env.uid})
+        overdue = self.browse([row[0] for row in self._cr.fetchall()])
+        overdue.invalidate_cache(["return_daley_days", "penalty",
+                                  "write_uid", "write_date"])
+        _logger.info("Accrued fines of %s overdue book issues", len(overdue))
+        return len(overdue)
 
     @api.onchange("date_issue", "day_to_return_book")
     def onchange_day_to_return_book(self):
@@ -345,19 +511,16 @@ class LibraryBookIssue(models.Model):
         """ This method used how many book can issue as per user type.
         @return : True or False.
         """
-        for rec in self:
-            if rec.card_id:
-                card_ids = rec.search_count([
-                    ("card_id", "=", rec.card_id.id),
-                    ("state", "in", ["issue", "reissue"])])
-                card_no = card_ids
-                if rec.state == "issue" or rec.state == "reissue":
-                    card_no = card_ids - 1
-                if rec.card_id.book_limit > card_no:
-                    return True
-                # Check the issue limit on card if it is over it give warning
+        status = self.mapped("card_id")._get_borrower_status()
+        for rec in self.filtered("card_id"):
+            card_no = status[rec.card_id.id]["issued"]
+            if rec.state not in ISSUED_STATES:
+                card_no += 1
+            # Check the issue limit on card if it is over it give warning
+            if card_no > rec.card_id.book_limit:
                 raise UserError(_(
                     """Book issue limit is over on this card!"""))
+        return True
 
     @api.onchange("card_id")
     def onchange_card_issue(self):
@@ -378,11 +541,13 @@ class LibraryBookIssue(models.Model):
     @api.constrains("card_id", "name")
     def check_book_issue(self):
         """Constraint to check issue book on same card"""
-        if self.search([
-                ("name", "=", self.name.id), ("id", "not in", self.ids),
-                ("card_id", "=", self.card_id.id),
-                ("state", "not in", ["draft", "cancel", "return", "paid"])]):
-            raise UserError(_(
+        status = self.mapped("card_id")._get_borrower_status()
+        for rec in self.filtered("card_id"):
+            opened = status[rec.card_id.id]["books"].get(rec.name.id, 0)
+            if rec.state not in ("draft", "cancel", "return", "paid"):
+                opened -= 1
+            if opened > 0:
+                raise UserError(_(
 """You cannot issue same book on same card more than once at same time!"""))
 
     def _update_student_vals(self, vals):
@@ -411,17 +576,84 @@ class LibraryBookIssue(models.Model):
             "card_name": card_rec.card_name,
             "user": str(card_rec.user.title())})
 
-    @api.model
-    def create(self, vals):
+    def _get_issued_books(self):
+        """Return the number of books issued by the records per book"""
+        issued = defaultdict(int)
+        for rec in self:
+            if rec.state in ISSUED_STATES:
+                issued[rec.name.id] += 1
+        return issued
+
+    def _create_history(self):
+        """Append a circulation snapshot of the book issues"""
+        today = fields.Date.context_today(self)
+        year = self.env["academic.year"].search([
+            ("date_start", "<=", today), ("date_stop", ">=", today)],
+            limit=1)
+        event_date = fields.Datetime.now()
+        self.env["book.history"].sudo().create([{
+            "book_issue_id": rec.id,
+            "book_issue_code": rec.issue_code,
+            "book_id": rec.name.id,
+            "card_id": rec.card_id.id,
+            "student_id": rec.student_id.id,
+            "teacher_id": rec.teacher_id.id,
+            "start_date": rec.date_issue,
+            "end_date": rec.actual_return_date,
+            "isbn": rec.name.isbn,
+            "barcode": rec.name.barcode,
+            "book_issue_state": rec.state,
+            "event_date": event_date,
+            "year_id": year.id,
+        } for rec in self])
+
+    def _update_circulation_stats(self, old_states):
+        """Count the issues and returns of the state transitions"""
+        now = fields.Datetime.now()
+        counts = {}
+        for rec in self:
+            old_state = old_states.get(rec.id)
+            issued = (rec.state in ISSUED_STATES and
+                      old_state not in ISSUED_STATES)
+            closed = (old_state in ISSUED_STATES and
+                      rec.state in ("return", "lost"))
+            if not (issued or closed) or rec.name.is_ebook:
+                continue
+            key = (rec.date_issue.date().replace(day=1), rec.name.id,
+                   rec.card_id.id, rec.standard_id.id or None)
+            values = counts.setdefault(key, [rec.student_id.id or None,
+                rec.teacher_id.id or None, 0, 0, 0.0, 0])
+            if issued:
+                values[2] += 1
+            if closed:
+                end_date = rec.actual_return_date or now
+                values[3] += 1
+                values[4] += (end_date - rec.date_issue).total_seconds(
+                    ) / 86400.0
+                if rec.date_return and end_date > rec.date_return:
+                    values[5] += 1
+        if counts:
+            self.env["library.circulation.stat"]._add_counts(counts)
+
+    def _update_book_counters(self, before=None):
+        """Update the issued books counters from the state transitions"""
+        before = before or {}
+        after = self._get_issued_books()
+        self.env["product.product"]._update_book_counters({
+            book_id: after.get(book_id, 0) - before.get(book_id, 0)
+            for book_id in set(before) | set(after)})
+
+    @api.model_create_multi
+    def create(self, vals_list):
         """Override create method"""
-        if vals.get("card_id") and vals.get("user") != "Teacher":
-            self._update_student_vals(vals)
-        if vals.get("card_id") and vals.get("user") == "Teacher":
-            self._update_teacher_vals(vals)
-        res = super(LibraryBookIssue, self).create(vals)
-        self.env['book.history'].create({'book_issue_id': res.id,
-                             'book_id': res.name.id,
-            })
+        for vals in vals_list:
+            if vals.get("card_id") and vals.get("user") != "Teacher":
+                self._update_student_vals(vals)
+            if vals.get("card_id") and vals.get("user") == "Teacher":
+                self._update_teacher_vals(vals)
+        res = super(LibraryBookIssue, self).create(vals_list)
+        res._update_book_counters()
+        res._create_history()
         return res
 
     def write(self, vals):
@@ -430,45 +662,101 @@ class LibraryBookIssue(models.Model):
             self._update_student_vals(vals)
         if vals.get("card_id") and vals.get("user") == "Teacher":
             self._update_teacher_vals(vals)
-        return super(LibraryBookIssue, self).write(vals)
+        if "state" not in vals and "name" not in vals:
+            return super(LibraryBookIssue, self).write(vals)
+        before = self._get_issued_books()
+        old_states = {rec.id: rec.state for rec in self}
+        res = super(LibraryBookIssue, self).write(vals)
+        self._update_book_counters(before)
+        if "state" in vals:
+            self._create_history()
+            self._update_circulation_stats(old_states)
+        return res
+
+    def unlink(self):
+        """Inherited method to release the issued books at deletion"""
+        before = self._get_issued_books()
+        res = super(LibraryBookIssue, self).unlink()
+        self.browse()._update_book_counters(before)
+        return res
 
     def draft_book(self):
         """This method for books in draft state."""
         self.state = "draft"
 
     def issue_book(self):
-        """This method used for issue a books."""
-        curr_dt = fields.Date.today()
+        """This method used for issue a books.
+
+        The borrower status of all cards is read once and updated while
+        the books are checked. Books are then issued in batches per return
+        days, so the constraints read the status once per batch.
+        """
         seq_obj = self.env["ir.sequence"]
+        status = self.mapped("card_id")._get_borrower_status()
         for rec in self:
-            if (rec.card_id.end_date < curr_dt and
-                    rec.card_id.end_date > curr_dt):
+            card_status = status[rec.card_id.id]
+            if not card_status["valid"]:
                 raise UserError(_("The Membership of library card is over!"))
-            code_issue = seq_obj.next_by_code("library.book.issue") or _("New"
-                    )
             if (rec.name and rec.name.availability == "notavailable" and
                     not rec.name.is_ebook):
                 raise UserError(_(
 "The book you have selected is not available. Please try after sometime!"))
-            if rec.student_id:
-                issue_str = ""
-                for book in rec.search([("card_id", "=", rec.card_id.id),
-                        ("state", "=", "fine")]):
-                    issue_str += str(book.issue_code) + ", "
-                # check if fine on book is paid until then user
-                # cannot issue new book
-                    raise UserError(_(
+            # check if fine on book is paid until then user
+            # cannot issue new book
+            if rec.student_id and card_status["fines"]:
+                raise UserError(_(
     """You can not request for a book until the fine is not paid for book issues
-    %s!""")% issue_str)
-            if rec.card_id:
-                card_rec = rec.search_count([("card_id", "=", rec.card_id.id),
-                    ("state", "in", ["issue", "reissue"])])
-                if rec.card_id.book_limit > card_rec:
-                    return_day = rec.name.day_to_return_book
-                    rec.write({"state": "issue",
-                            "day_to_return_book": return_day,
-                            "issue_code": code_issue})
-            return True
+    %s!""") % ", ".join(card_status["fines"]))
+            if card_status["issued"] >= rec.card_id.book_limit:
+                raise UserError(_(
+                    """Book issue limit is over on this card!"""))
+            books = card_status["books"]
+            if books.get(rec.name.id, 0) - (rec.state not in (
+                    "draft", "cancel", "return", "paid")) > 0:
+                raise UserError(_(
+"""You cannot issue same book on same card more than once at same time!"""))
+            card_status["issued"] += 1
+            books[rec.name.id] = books.get(rec.name.id, 0) + 1
+        by_return_days = defaultdict(lambda: self.browse())
+        for rec in self:
+            rec.issue_code = seq_obj.next_by_code("library.book.issue") or _(
+                "New")
+            by_return_days[rec.name.day_to_return_book] |= rec
+        # the constraints check each batch of issued books with one query
+        for return_days, issues in by_return_days.items():
+            issues.write({"state": "issue",
+                          "day_to_return_book": return_days})
+        return True
+
+    @api.model
+    def bulk_checkout(self, scans):
+        """Issue books to cards from scanned (card number, book code) pairs.
+
+        Cards are found by number and books by barcode or ISBN with one
+        search each, then all books are issued in one batch.
+        """
+        card_codes = {card_code for card_code, book_code in scans}
+        book_codes = {book_code for card_code, book_code in scans}
+        cards = {card.code: card for card in self.env["library.card"].search(
+            [("code", "in", list(card_codes))])}
+        books = {}
+        for book in self.env["product.product"].search([
+                "|", ("barcode", "in", list(book_codes)),
+                ("isbn", "in", list(book_codes))]):
+            books.setdefault(book.barcode, book)
+            books.setdefault(book.isbn, book)
+        missing = sorted(card_codes - set(cards)) + sorted(
+            book_codes - set(books))
+        if missing:
+            raise UserError(_("Unknown card or book codes: %s") % (
+                ", ".join(missing)))
+        issues = self.create([{
+            "card_id": cards[card_code].id,
+            "name": books[book_code].id,
+            "user": cards[card_code].user == "teacher" and "Teacher" or
+            "Student"} for card_code, book_code in scans])
+        issues.issue_book()
+        return issues
 
     def reissue_book(self):
         """This method used for reissue a books."""
@@ -481,10 +769,14 @@ class LibraryBookIssue(models.Model):
                     'actual_return_date': False})
 
     def return_book(self):
-        """This method used for return a books."""
+        """This method used for return a books.
+
+        The returned copies are allocated to the holds waiting for them.
+        """
         self.actual_return_date = fields.datetime.now()
         self._compute_penalty()
         self.state = "return"
+        self.env["library.book.request"]._dispatch_holds(self.mapped("name"))
 
     def lost_book(self):
         """Method to create scrap records for lost books"""
@@ -513,53 +805,84 @@ class LibraryBookIssue(models.Model):
         """This method used for cancel book issue."""
         self.state = "cancel"
 
-    def user_fine(self):
-        """
-        This method used when penalty on book either late return or book lost
-        and generate invoice of fine.
+    def _get_invoice_partner(self):
+        """Return the partner of the borrower invoiced for the book issue"""
+        self.ensure_one()
+        if self.user == "Student":
+            if not self.student_id.partner_id.contact_address:
+                raise UserError(_(
+                    "Error! The Student must have a Home address!"))
+            return self.student_id.partner_id
+        if not self.teacher_id.employee_id.address_home_id:
+            raise UserError(_("Error ! Teacher must have a Home address."))
+        return self.teacher_id.employee_id.user_id.partner_id
+
+    def _get_line_name(self, name):
+        return self.issue_code and "%s (%s)" % (name, self.issue_code) or name
+
+    def _get_fine_line_vals(self):
+        """Return the invoice lines of the lost and late return fines"""
+        self.ensure_one()
+        line_vals = []
+        if self.lost_penalty:
+            line_vals.append({
+                "name": self._get_line_name(_("Book Lost Fine")),
+                "price_unit": self.lost_penalty})
+        if self.penalty:
+            line_vals.append({
+                "name": self._get_line_name(_("Late Return Penalty")),
+                "price_unit": self.penalty})
+        return line_vals
+
+    def _get_subscription_line_vals(self):
+        """Return the invoice line of the book subscription"""
+        self.ensure_one()
+        if not self.subscription_amt:
+            return []
+        return [{
+            "name": self._get_line_name(_("Book Subscription Amount")),
+            "price_unit": self.subscription_amt}]
+
+    def _create_borrower_invoices(self, get_line_vals):
+        """Create one invoice per borrower with the lines of its issues.
+
+        All invoices are created with one create, get_line_vals returns
+        the invoice line values of a book issue.
         """
-        invoice_obj = self.env["account.move"]
-        #       check whether address has been defined or not for student and teacher
-        for record in self:
-            if record.user == "Student":
-                usr = record.student_id.partner_id.id
-                if not record.student_id.partner_id.contact_address:
-                    raise UserError(_(
-                        "Error! The Student must have a Home address!"))
-            else:
-                usr = record.teacher_id.employee_id.user_id.partner_id.id
-                if not record.teacher_id.employee_id.address_home_id:
-                    raise UserError(
-                        _("Error ! Teacher must have a Home address."))
-
-            # prepare and create value of account.move
-            vals_invoice = {
+        invoice_obj = self.env["account.move"].with_context(
+            default_move_type="out_invoice")
+        journal = invoice_obj._get_default_journal()
+        acc_id = journal.default_account_id.id
+        issues_by_partner = {}
+        for rec in self:
+            partner = rec._get_invoice_partner()
+            issues_by_partner.setdefault(partner, self.browse())
+            issues_by_partner[partner] |= rec
+        invoice_vals_list = []
+        for partner, issues in issues_by_partner.items():
+            invoice_vals_list.append({
                 "move_type": "out_invoice",
-                "partner_id": usr,
-                "book_issue_id": record.id,
-                "book_issue_reference": record.issue_code or "",
-            }
-            new_invoice_rec = invoice_obj.create(vals_invoice)
-            # prepare move line value as lost books penalty
-            acc_id = new_invoice_rec.journal_id.default_account_id.id
-            invoice_line_ids = []
-            if record.lost_penalty:
-                invoice_line_ids.append((0, 0, {
-                    "name": "Book Lost Fine",
-                    "price_unit": record.lost_penalty,
-                    "move_id": new_invoice_rec.id,
-                    "account_id": acc_id}))
-            # prepare move line value as late books return penalty
-            if record.penalty:
-                invoice_line_ids.append((0, 0, {
-                    "name": "Late Return Penalty",
-                    "price_unit": record.penalty,
-                    "move_id": new_invoice_rec.id,
-                    "account_id": acc_id}))
-            # update move lines for created move and
-            # redirect it to particular invoice
-            new_invoice_rec.write({"invoice_line_ids": invoice_line_ids})
-        self.state = "fine"
+                "partner_id": partner.id,
+                "journal_id": journal.id,
+                "book_issue_id": len(issues) == 1 and issues.id or False,
+                "book_issue_ids": [(6, 0, issues.ids)],
+                "book_issue_reference": ", ".join(
+                    code for code in issues.mapped("issue_code") if code),
+                "invoice_line_ids": [
+                    (0, 0, dict(vals, account_id=acc_id))
+                    for issue in issues for vals in get_line_vals(issue)]})
+        return invoice_obj.create(invoice_vals_list)
+
+    def _get_invoice_action(self, invoices, context):
+        """Return the action showing the created invoices"""
+        if len(invoices) != 1:
+            return {
+                "name": _("New Invoices"),
+                "view_mode": "tree,form",
+                "res_model": "account.move",
+                "type": "ir.actions.act_window",
+                "domain": [("id", "in", invoices.ids)],
+                "context": context}
         view_id = self.env.ref("account.view_move_form")
         return {
             "name": _("New Invoice"),
@@ -568,60 +891,65 @@ class LibraryBookIssue(models.Model):
             "res_model": "account.move",
             "type": "ir.actions.act_window",
             "nodestroy": True,
-            "res_id": new_invoice_rec.id,
+            "res_id": invoices.id,
             "target": "current",
-            "context": {"default_move_type": "out_invoice"},
+            "context": context,
         }
 
+    def _invoice_fines(self):
+        """Invoice the fines of the book issues grouped per borrower"""
+        invoices = self._create_borrower_invoices(
+            lambda issue: issue._get_fine_line_vals())
+        self.write({"state": "fine"})
+        return invoices
+
+    def user_fine(self):
+        """
+        This method used when penalty on book either late return or book lost
+        and generate invoice of fine.
+        """
+        invoices = self._invoice_fines()
+        return self._get_invoice_action(
+            invoices, {"default_move_type": "out_invoice"})
+
+    @api.model
+    def _cron_invoice_fines(self, batch_size=1000):
+        """Schedular to invoice the fines of returned and lost books"""
+        issues = self.search([
+            ("state", "in", ["return", "lost"]), "|",
+            ("penalty", ">", 0), ("lost_penalty", ">", 0)],
+            limit=batch_size, order="id")
+        to_invoice = self.browse()
+        for rec in issues:
+            try:
+                rec._get_invoice_partner()
+            except UserError as error:
+                _logger.warning("Fine of book issue %s not invoiced: %s",
+                                rec.id, error)
+                continue
+            to_invoice |= rec
+        invoices = to_invoice._invoice_fines()
+        _logger.info("Invoiced fines of %s book issues in %s invoices",
+                     len(to_invoice), len(invoices))
+        return len(invoices)
+
     def subscription_pay(self):
         """Method to pay for subscription"""
-        invoice_obj = self.env["account.move"]
-        for record in self:
-            if record.user == "Student":
-                usr = record.student_id.partner_id.id
-                if not record.student_id.partner_id.contact_address:
-                    raise UserError(_(
-"Error ! The Student must have a Home address."))
-            else:
-                usr = record.teacher_id.employee_id.user_id.partner_id.id
-                if not record.teacher_id.employee_id.address_home_id:
-                    raise UserError(_(
-"Error ! Teacher must have a Home address!."))
-            new_invoice_rec = invoice_obj.create({
-                "move_type": "out_invoice",
-                "partner_id": usr,
-                "book_issue_id": record.id,
-                "book_issue_reference": record.issue_code or ""})
-            acc_id = new_invoice_rec.journal_id.default_account_id.id
-            invoice_line_ids = []
-            if record.subscription_amt:
-                subcription_amount = record.subscription_amt
-                invoice_line_ids.append((0, 0, {
-                    "name": "Book Subscription Amount",
-                    "price_unit": subcription_amount,
-                    "move_id": new_invoice_rec.id,
-                    "account_id": acc_id,
-                }))
-            new_invoice_rec.write({"invoice_line_ids": invoice_line_ids})
+        invoices = self._create_borrower_invoices(
+            lambda issue: issue._get_subscription_line_vals())
         self.state = "pending"
-        view_id = self.env.ref("account.view_move_form")
-        return {
-            "name": _("New Invoice"),
-            "view_mode": "form",
-            "view_id": view_id.ids,
-            "res_model": "account.move",
-            "type": "ir.actions.act_window",
-            "nodestroy": True,
-            "res_id": new_invoice_rec.id,
-            "target": "current",
-            "context": {"default_type": "out_invoice"},
-        }
+        return self._get_invoice_action(
+            invoices, {"default_type": "out_invoice"})
+
+    def _get_invoice_domain(self):
+        return ["|", ("book_issue_id", "=", self.id),
+                ("book_issue_ids", "in", self.ids)]
 
     def view_invoice(self):
         """this method is use for the view invoice of penalty"""
         invoice_obj = self.env["account.move"]
         for rec in self:
-            invoices_rec = invoice_obj.search([("book_issue_id", "=", rec.id)])
+            invoices_rec = invoice_obj.search(rec._get_invoice_domain())
             action = self.env.ref(
                 "account.action_move_out_invoice_type"
             ).read()[0]
@@ -639,8 +967,7 @@ class LibraryBookIssue(models.Model):
         """Method to compute invoices"""
         inv_obj = self.env["account.move"]
         for rec in self:
-            count_invoice = inv_obj.search_count([
-                ("book_issue_id", "=", rec.id)])
+            count_invoice = inv_obj.search_count(rec._get_invoice_domain())
             rec.compute_inv = count_invoice
 
 
@@ -671,9 +998,19 @@ class LibraryBookRequest(models.Model):
     new_book = fields.Char("New Book Name", help="Enter new book name")
     book_name = fields.Char("Name", compute="_compute_bname", store=True,
         help="Enter book name")
-    state = fields.Selection([("draft", "Draft"), ("confirm", "Confirm"),
-        ("cancel", "Cancelled")], "State", default="draft",
-        help="State of library book request")
+    state = fields.Selection([("draft", "Draft"), ("waiting", "On Hold"),
+        ("confirm", "Confirm"), ("cancel", "Cancelled")], "State",
+        default="draft", help="State of library book request")
+    priority = fields.Selection([("0", "Normal"), ("1", "Urgent")],
+        "Priority", default="0",
+        help="Urgent holds are allocated before the normal ones")
+    request_date = fields.Datetime("Hold Date", readonly=True, copy=False,
+        help="Date the request was put on hold")
+    queue_position = fields.Integer("Queue Position",
+        compute="_compute_queue_position",
+        help="Position of the hold in the queue of the book")
+    issue_id = fields.Many2one("library.book.issue", "Book Issue",
+        readonly=True, copy=False, help="Book issue of the request")
     book_return_days = fields.Integer(related="name.day_to_return_book",
         string="Return Days", help="Book return days")
     ebook_name = fields.Many2one("product.product", "E book Name",
@@ -705,39 +1042,41 @@ class LibraryBookRequest(models.Model):
         """Method to change state as draft"""
         self.state = "draft"
 
+    def _create_book_issue(self):
+        """Create and return the book issue of the request"""
+        self.ensure_one()
+        vals = {"card_id": self.card_id.id, "name": self.name.id}
+        if self.type == "ebook":
+            vals.update({
+                "name": self.ebook_name.id,
+                "subscription_amt": self.ebook_name.subscrption_amt})
+        issue_id = self.env["library.book.issue"].create(vals)
+        if self.type == "ebook":
+            # the e-book is downloaded from the book, not copied on the issue
+            issue_id.write({"state": self.ebook_name.is_subscription and
+                            "subscribe" or "paid"})
+        issue_id.onchange_card_issue()
+        self.write({"state": "confirm", "issue_id": issue_id.id})
+        return issue_id
+
     def confirm_book_request(self):
-        """Method to confirm book request"""
-        book_issue_obj = self.env["library.book.issue"]
+        """Method to confirm book request.
+
+        A hard copy request is put on hold when no copy of the book is
+        available or other borrowers are already waiting for it.
+        """
         curr_dt = fields.Date.today()
-        vals = {}
         if (curr_dt <= self.card_id.start_date
             and curr_dt >= self.card_id.end_date):
             raise UserError(_("The Membership of library card is over!"))
-        if self.type == "existing":
-            vals.update({"card_id": self.card_id.id, "name": self.name.id})
-        elif self.type == "ebook":
-            vals.update({
-                "name": self.ebook_name.id,
-                "card_id": self.card_id.id,
-                "subscription_amt": self.ebook_name.subscrption_amt})
-        issue_id = book_issue_obj.create(vals)
-        if self.type == "ebook":
-            issue_vals = {}
-            if not self.ebook_name.is_subscription:
-                issue_vals.update({
-                    "state": "paid",
-                    "ebook_download": self.ebook_name.attach_ebook})
-            else:
-                issue_vals.update({
-                    "state": "subscribe",
-                    "ebook_download": self.ebook_name.attach_ebook})
-            issue_id.write(issue_vals)
-        else:
-            issue_id.write({"state": "draft"})
-        self.state = "confirm"
-        # changes state to confirm
-        if issue_id:
-            issue_id.onchange_card_issue()
+        if self.type == "existing" and (
+                self.name.books_available <= 0 or self.search_count([
+                    ("state", "=", "waiting"), ("name", "=", self.name.id)])):
+            self.write({"state": "waiting",
+                        "request_date": fields.Datetime.now()})
+            self._dispatch_holds(self.name)
+            return True
+        issue_id = self._create_book_issue()
         return {
             "name": ("Book Issue"),
             "view_mode": "form",
@@ -747,6 +1086,72 @@ class LibraryBookRequest(models.Model):
             "target": "current",
         }
 
+    @api.model
+    def _dispatch_holds(self, books, batch_size=50):
+        """Allocate the available copies of the books to their holds.
+
+        Holds are read in queue order from the partial index in batches
+        and locked with SKIP LOCKED, so concurrent returns of a title never
+        allocate the same hold twice. A hold is allocated by issuing the
+        book on its card, holds whose borrower can not take the book now
+        stay in the queue.
+        """
+        allocated = self.browse()
+        for book in books.filtered(lambda book: not book.is_ebook):
+            skipped = [0]
+            while book.books_available > 0:
+                self.flush(["state", "name", "priority", "request_date"])
+                self._cr.execute("""
+                    SELECT id FROM library_book_request
+                    WHERE state = 'waiting' AND name = %s AND id NOT IN %s
+                    ORDER BY priority DESC, request_date, id
+                    LIMIT %s FOR UPDATE SKIP LOCKED""",
+                    (book.id, tuple(skipped), batch_size))
+                holds = self.browse([row[0] for row in self._cr.fetchall()])
+                if not holds:
+                    break
+                for hold in holds:
+                    if book.books_available <= 0:
+                        break
+                    try:
+                        with self._cr.savepoint():
+                            hold._create_book_issue().issue_book()
+                        allocated |= hold
+                    except UserError as error:
+                        # values written before the rollback are stale
+                        self.invalidate_cache()
+                        _logger.info("Hold %s of book %s skipped: %s",
+                                     hold.req_id, book.display_name, error)
+                        skipped.append(hold.id)
+        return allocated
+
+    @api.depends("state", "name", "priority", "request_date")
+    def _compute_queue_position(self):
+        """Method to compute the position of the holds in their queue"""
+        holds = self.filtered(lambda rec: rec.state == "waiting" and rec.id)
+        positions = {}
+        if holds:
+            self.flush(["state", "name", "priority", "request_date"])
+            self._cr.execute("""
+                SELECT id, position FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY name
+                        ORDER BY priority DESC, request_date, id) AS position
+                    FROM library_book_request
+                    WHERE state = 'waiting' AND name IN %s) queue
+                WHERE id IN %s""",
+                (tuple(holds.mapped("name").ids), tuple(holds.ids)))
+            positions = dict(self._cr.fetchall())
+        for rec in self:
+            rec.queue_position = positions.get(rec.id, 0)
+
+    def init(self):
+        """Create the index used to read the hold queues"""
+        self._cr.execute("""
+            CREATE INDEX IF NOT EXISTS library_book_request_hold_index
+            ON library_book_request (name, priority DESC, request_date, id)
+            WHERE state = 'waiting'""")
+
     def unlink(self):
         """Inherited method to check state at record deletion"""
         for rec in self:
@@ -777,24 +1182,64 @@ class StudentLibrary(models.Model):
 
 
 class BookHistory(models.Model):
+    """Circulation snapshot of a book issue.
+
+    A snapshot is appended at every state transition of a book issue with
+    the values of that time, history views and circulation reports read
+    this table only. Rows are grouped by academic year through the indexed
+    year_id.
+    """
+
     _name = "book.history"
     _description = "Book History"
+    _order = "event_date desc, id desc"
 
     book_issue_id = fields.Many2one('library.book.issue',
-                                    string="Book Issue")
-    book_issue_code = fields.Char(related="book_issue_id.issue_code",
-                                  string="Book Issue")
+                                    string="Book Issue", index=True)
+    book_issue_code = fields.Char(string="Book Issue")
     book_id = fields.Many2one('product.product',
                               string="Book")
-    card_id = fields.Many2one(related="book_issue_id.card_id",
-                              string="Card")
-    student_id = fields.Many2one(related="book_issue_id.student_id",
-                              string="Employee")
-    start_date = fields.Datetime(related='book_issue_id.date_issue',
-                              string="Start Date")
-    end_date = fields.Datetime(related="book_issue_id.actual_return_date" ,
-                               string="End Date")
-    isbn = fields.Char(related="book_id.isbn", string="ISBN")
-    barcode = fields.Char(related="book_id.barcode", string="Barcode")
-    book_issue_state = fields.Selection(related="book_issue_id.state" ,
-                                        string="Book issue State")
+    card_id = fields.Many2one("library.card", string="Card")
+    student_id = fields.Many2one("student.student", string="Student")
+    teacher_id = fields.Many2one("school.teacher", string="Teacher")
+    start_date = fields.Datetime(string="Start Date")
+    end_date = fields.Datetime(string="End Date")
+    isbn = fields.Char(string="ISBN")
+    barcode = fields.Char(string="Barcode")
+    book_issue_state = fields.Selection([("draft", "Draft"),
+        ("issue", "Issued"), ("reissue", "Reissued"),
+        ("cancel", "Cancelled"), ("return", "Returned"), ("lost", "Lost"),
+        ("fine", "Fined"), ("paid", "Done"), ("subscribe", "Subscribe"),
+        ("pending", "Pending")], string="Book issue State")
+    event_date = fields.Datetime("Event Date", default=fields.Datetime.now,
+        help="Date of the state transition")
+    year_id = fields.Many2one("academic.year", "Academic Year",
+        help="Academic year of the state transition")
+
+    def init(self):
+        """Create the per year indexes of the circulation reports"""
+        create_index(self._cr, "book_history_year_book_index", self._table,
+                     ["year_id", "book_id", "event_date"])
+        create_index(self._cr, "book_history_year_student_index",
+                     self._table, ["year_id", "student_id", "event_date"])
+        # Fill the snapshots written before they were denormalised
+        self._cr.execute("""
+            UPDATE book_history history
+            SET book_issue_code = issue.issue_code,
+                card_id = issue.card_id,
+                student_id = issue.student_id,
+                teacher_id = issue.teacher_id,
+                start_date = issue.date_issue,
+                end_date = issue.actual_return_date,
+                book_issue_state = issue.state,
+                isbn = book.isbn,
+                barcode = book.barcode,
+                event_date = history.create_date
+            FROM library_book_issue issue
+            JOIN product_product book ON book.id = issue.name
+            WHERE issue.id = history.book_issue_id
+                AND history.book_issue_state IS NULL""")
+
+    def write(self, vals):
+        """Inherited method to keep the circulation history append-only"""
+        raise UserError(_("Book history can not be modified!"))
@@ -0,0 +1,146 @@
+# See LICENSE file for full copyright and licensing details.
+
+from odoo import api, fields, models
+
+# Measures summed into the weighted averages of the statistics
+RATIO_FIELDS = {
+    "avg_loan_days": ("loan_days", "return_count", 1.0),
+    "overdue_rate": ("overdue_count", "return_count", 100.0),
+}
+
+
+class LibraryCirculationStat(models.Model):
+    """Circulation statistics of the books per month, card and standard.
+
+    Counters are incremented from the state transitions of the book
+    issues, circulation reports read this table instead of the book
+    issues. Rows are written by SQL only and are read-only to users.
+    """
+
+    _name = "library.circulation.stat"
+    _description = "Circulation Statistics"
+    _order = "month desc, issue_count desc"
+
+    month = fields.Date("Month", readonly=True,
+        help="Month the books were issued")
+    book_id = fields.Many2one("product.product", "Book", readonly=True,
+        help="Issued book")
+    card_id = fields.Many2one("library.card", "Card No", readonly=True,
+        help="Library card of the borrower")
+    standard_id = fields.Many2one("school.standard", "Standard",
+        readonly=True, help="Standard of the borrower")
+    student_id = fields.Many2one("student.student", "Student",
+        readonly=True, help="Student borrower")
+    teacher_id = fields.Many2one("school.teacher", "Teacher", readonly=True,
+        help="Teacher borrower")
+    issue_count = fields.Integer("Issues", readonly=True,
+        help="Number of issued books")
+    return_count = fields.Integer("Returns", readonly=True,
+        help="Number of returned or lost books")
+    loan_days = fields.Float("Loan Days", readonly=True,
+        help="Total days the returned books were on loan")
+    overdue_count = fields.Integer("Overdue Returns", readonly=True,
+        help="Number of books returned after their return date")
+    avg_loan_days = fields.Float("Average Loan Days", readonly=True,
+        group_operator="avg", help="Average days a book is on loan")
+    overdue_rate = fields.Float("Overdue Rate (%)", readonly=True,
+        group_operator="avg", help="Share of the books returned late")
+
+    def init(self):
+        """Create the key of the counters and fill them on first install"""
+        self._cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS library_circulation_stat_key
+            ON library_circulation_stat
+            (month, book_id, card_id, COALESCE(standard_id, 0))""")
+        self._cr.execute("SELECT 1 FROM library_circulation_stat LIMIT 1")
+        if self._cr.fetchone():
+            return
+        self._cr.execute("""
+            INSERT INTO library_circulation_stat (month, book_id, card_id,
+                standard_id, student_id, teacher_id, issue_count,
+                return_count, loan_days, overdue_count, create_date,
+                write_date)
+            SELECT date_trunc('month', issue.date_issue)::date, issue.name,
+                issue.card_id, issue.standard_id, MAX(issue.student_id),
+                MAX(issue.teacher_id), COUNT(*),
+                COUNT(*) FILTER (WHERE issue.state != ALL(%(issued)s)),
+                COALESCE(SUM(EXTRACT(EPOCH FROM COALESCE(
+                    issue.actual_return_date, issue.write_date) -
+                    issue.date_issue) / 86400.0) FILTER (
+                    WHERE issue.state != ALL(%(issued)s)), 0),
+                COUNT(*) FILTER (WHERE issue.state != ALL(%(issued)s)
+                    AND issue.actual_return_date > issue.date_return),
+                now() at time zone 'UTC', now() at time zone 'UTC'
+            FROM library_book_issue issue
+            JOIN product_product book ON book.id = issue.name
+            WHERE issue.state IN ('issue', 'reissue', 'return', 'lost',
+                    'fine', 'paid')
+                AND book.is_ebook IS NOT TRUE
+            GROUP BY 1, issue.name, issue.card_id, issue.standard_id""",
+            {"issued": ["issue", "reissue"]})
+        self._update_ratios()
+
+    def _update_ratios(self, ids=None):
+        """Recompute the averages of the counters from their sums"""
+        query = """
+            UPDATE library_circulation_stat
+            SET avg_loan_days = CASE WHEN return_count > 0
+                    THEN loan_days / return_count ELSE 0 END,
+                overdue_rate = CASE WHEN return_count > 0
+                    THEN 100.0 * overdue_count / return_count ELSE 0 END"""
+        if ids is None:
+            self._cr.execute(query)
+        elif ids:
+            self._cr.execute(query + " WHERE id IN %s", (tuple(ids),))
+
+    @api.model
+    def _add_counts(self, counts):
+        """Increment the counters from the state transitions of the issues.
+
+        :param counts: {(month, book id, card id, standard id):
+            [student id, teacher id, issues, returns, loan days, overdue]}
+        """
+        ids = []
+        for key, values in counts.items():
+            self._cr.execute("""
+                INSERT INTO library_circulation_stat AS stat (month,
+                    book_id, card_id, standard_id, student_id, teacher_id,
+                    issue_count, return_count, loan_days, overdue_count,
+                    create_uid, create_date, write_uid, write_date)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
+                    now() at time zone 'UTC', %s, now() at time zone 'UTC')
+                ON CONFLICT (month, book_id, card_id, COALESCE(standard_id, 0))
+                DO UPDATE SET
+                    issue_count = stat.issue_count + EXCLUDED.issue_count,
+                    return_count = stat.return_count + EXCLUDED.return_count,
+                    loan_days = stat.loan_days + EXCLUDED.loan_days,
+                    overdue_count = stat.overdue_count +
+                        EXCLUDED.overdue_count,
+                    write_uid = EXCLUDED.write_uid,
+                    write_date = EXCLUDED.write_date
+                RETURNING id""",
+                key + tuple(values) + (self._uid, self._uid))
+            ids.append(self._cr.fetchone()[0])
+        self._update_ratios(ids)
+        self.invalidate_cache(ids=ids)
+
+    @api.model
+    def read_group(self, domain, fields, groupby, offset=0, limit=None,
+                   orderby=False, lazy=True):
+        """Inherited method to weight the averages by the returned books"""
+        names = [field.split(":")[0] for field in fields]
+        ratios = [name for name in RATIO_FIELDS if name in names]
+        extra = []
+        for name in ratios:
+            for total in RATIO_FIELDS[name][:2]:
+                if total not in names + extra:
+                    extra.append(total)
+        res = super(LibraryCirculationStat, self).read_group(domain,
+            fields + extra, groupby, offset=offset, limit=limit,
+            orderby=orderby, lazy=lazy)
+        for line in res:
+            for name in ratios:
+                total, count, factor = RATIO_FIELDS[name]
+                line[name] = (line.get(count) and
+                              factor * line[total] / line[count] or 0.0)
+        return res
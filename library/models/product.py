@@ -1,15 +1,21 @@
 # See LICENSE file for full copyright and licensing details.
 
+import logging
+import re
+
+import psycopg2
+
 from odoo import _, api, fields, models
 from odoo.exceptions import ValidationError
+from odoo.osv.query import Query
+
+_logger = logging.getLogger(__name__)
 
 
 class ProductTemplate(models.Model):
     _inherit = "product.template"
 
     name = fields.Char("Name", required=True, help="Book Name")
-    book_history_ids = fields.One2many('book.history', 'book_id',
-                                       string="Book History")
 
 
 class ProductCategory(models.Model):
@@ -108,18 +114,149 @@ class ProductProduct(models.Model):
                     vals["seller_ids"].append(supplier)
         return super(ProductProduct, self).create(vals)
 
-    @api.depends("qty_available")
-    def _compute_books_available(self):
-        """Computes the available books"""
-        book_issue_obj = self.env["library.book.issue"]
-        for rec in self:
-            issue_rec_no = book_issue_obj.sudo().search_count(
-                [("name", "=", rec.id), ("state", "in", ("issue", "reissue"))]
-            )
-            # reduces the quantity when book is issued
-            rec.books_available = rec.qty_available - issue_rec_no
+    def _update_book_counters(self, deltas):
+        """Apply issued book deltas {product id: count} on the counters.
+
+        The product rows are locked so concurrent checkouts of the same
+        book wait for each other and cannot issue more books than
+        available.
+        """
+        deltas = {product_id: delta for product_id, delta in deltas.items()
+                  if product_id and delta}
+        if not deltas:
+            return
+        self._cr.execute("""
+            SELECT id FROM product_product
+            WHERE id IN %s ORDER BY id FOR UPDATE""", (tuple(deltas),))
+        products = self.sudo().browse(sorted(deltas))
+        products.invalidate_cache(["books_issued", "books_available"])
+        for product in products:
+            delta = deltas[product.id]
+            if (delta > 0 and not product.is_ebook and
+                    product.books_available < delta):
+                raise ValidationError(_(
+"The book you have selected is not available. Please try after sometime!"))
+            product.write({
+                "books_issued": product.books_issued + delta,
+                "books_available": product.books_available - delta})
+
+    def _refresh_books_available(self):
+        """Update available books of the products from their stock"""
+        for product in self:
+            books_available = product.qty_available - product.books_issued
+            if product.books_available != books_available:
+                product.books_available = books_available
+
+    @api.model
+    def _cron_reconcile_book_counters(self):
+        """Schedular to fix drift of the issued and available books"""
+        self.env["library.book.issue"].flush(["name", "state"])
+        self._cr.execute("""
+            SELECT name, COUNT(*) FROM library_book_issue
+            WHERE state IN ('issue', 'reissue') GROUP BY name""")
+        issued = dict(self._cr.fetchall())
+        products = self.search(["|", ("categ_id.book_categ", "=", True),
+                                "|", ("id", "in", list(issued)),
+                                ("books_issued", "!=", 0)])
+        for product in products:
+            if product.books_issued != issued.get(product.id, 0):
+                product.books_issued = issued.get(product.id, 0)
+        products._refresh_books_available()
         return True
 
+    @api.depends("name", "author.name", "isbn", "catalog_num", "barcode",
+                 "default_code")
+    def _compute_catalogue_search(self):
+        """Compute the text indexed by the catalogue search"""
+        for rec in self:
+            rec.catalogue_search = " ".join(value for value in (
+                rec.name, rec.author.name, rec.isbn, rec.catalog_num,
+                rec.barcode, rec.default_code) if value)
+
+    def init(self):
+        """Create the full-text and trigram indexes of the catalogue"""
+        try:
+            with self._cr.savepoint():
+                self._cr.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except psycopg2.Error:
+            _logger.warning("pg_trgm is not available, the library "
+                            "catalogue search uses full-text only")
+        self._cr.execute("""
+            CREATE INDEX IF NOT EXISTS product_product_catalogue_fts_index
+            ON product_product USING gin (
+                to_tsvector('simple', COALESCE(catalogue_search, '')))""")
+        if self._has_trigram():
+            self._cr.execute("""
+                CREATE INDEX IF NOT EXISTS
+                    product_product_catalogue_trgm_index
+                ON product_product USING gin (
+                    catalogue_search gin_trgm_ops)""")
+
+    def _has_trigram(self):
+        self._cr.execute(
+            "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return bool(self._cr.fetchone())
+
+    @api.model
+    def _search_catalogue(self, query, limit=20, domain=None,
+                          access_rights_uid=None):
+        """Return the ids of the books matching the query, best first.
+
+        Exact ISBN, barcode or catalog number matches come first, then
+        the full-text rank on title, author and codes, completed by the
+        trigram similarity when pg_trgm is installed. Only the books of
+        the domain are ranked.
+        """
+        words = re.findall(r"\w+", query or "")
+        if not words:
+            return []
+        books = self._search(domain or [], access_rights_uid=access_rights_uid)
+        if not isinstance(books, Query):
+            return []
+        books_sql, books_params = books.subselect()
+        self.flush(["catalogue_search", "isbn", "barcode", "catalog_num"])
+        trigram = self._has_trigram()
+        query = query.strip()
+        tsquery = " & ".join("%s:*" % word for word in words)
+        self._cr.execute("""
+            SELECT id FROM (
+                SELECT id,
+                    CASE WHEN %s IN (isbn, barcode, catalog_num)
+                        THEN 2 ELSE 0 END
+                    + ts_rank(
+                        to_tsvector('simple', COALESCE(catalogue_search, '')),
+                        to_tsquery('simple', %s))
+                    {similarity} AS rank
+                FROM product_product
+                WHERE id IN ({books}) AND (
+                    %s IN (isbn, barcode, catalog_num)
+                    OR to_tsvector('simple', COALESCE(catalogue_search, ''))
+                        @@ to_tsquery('simple', %s)
+                    {trigram_match})
+            ) AS books
+            ORDER BY rank DESC, id
+            LIMIT %s""".format(
+                similarity=trigram and
+                "+ similarity(catalogue_search, %s)" or "",
+                books=books_sql,
+                trigram_match=trigram and "OR catalogue_search %% %s" or ""),
+            [query, tsquery] + (trigram and [query] or []) + books_params +
+            [query, tsquery] + (trigram and [query] or []) + [limit])
+        return [row[0] for row in self._cr.fetchall()]
+
+    @api.model
+    def _name_search(self, name, args=None, operator="ilike", limit=100,
+                     name_get_uid=None):
+        """Inherited method to use the ranked catalogue search for books"""
+        if (not self._context.get("library_catalogue_search") or
+                not name or operator not in ("ilike", "like")):
+            return super(ProductProduct, self)._name_search(
+                name, args=args, operator=operator, limit=limit,
+                name_get_uid=name_get_uid)
+        return self._search_catalogue(name, limit=limit or None,
+                                      domain=list(args or []),
+                                      access_rights_uid=name_get_uid)
+
     @api.depends("books_available", 'day_to_return_book')
     def _compute_books_availablity(self):
         """Method to compute availability of book"""
@@ -152,8 +289,10 @@ class ProductProduct(models.Model):
     nbpage = fields.Integer("Number of pages", help="Enter number of pages")
     rack = fields.Many2one("library.rack", "Rack",
         help="Shows position of book")
-    books_available = fields.Float("Books Available",
-        compute="_compute_books_available", help="Available books")
+    books_issued = fields.Integer("Books Issued", readonly=True,
+        copy=False, help="Issued books")
+    books_available = fields.Float("Books Available", readonly=True,
+        copy=False, help="Available books")
     availability = fields.Selection([("available", "Available"),
         ("notavailable", "Not Available")], "Book Availability",
         default="available", compute="_compute_books_availablity",
@@ -179,6 +318,11 @@ class ProductProduct(models.Model):
     attchment_ids = fields.One2many("book.attachment", "product_id",
         "Book Attachments", help="Book attachments")
     library_shelf_id = fields.Many2one('library.shelf', string="Library Shelf")
+    book_history_ids = fields.One2many('book.history', 'book_id',
+                                       string="Book History")
+    catalogue_search = fields.Char("Catalogue Search",
+        compute="_compute_catalogue_search", store=True,
+        help="Title, author and codes indexed by the catalogue search")
 
     _sql_constraints = [("unique_barcode_code", "unique(barcode,code)",
                  "Barcode and Code must be unique across all the products!")]
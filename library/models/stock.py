@@ -8,6 +8,17 @@ class StockMove(models.Model):
 
     origin_ref = fields.Char("Origin")
 
+    def _action_done(self, cancel_backorder=False):
+        """Inherited method to update available books of moved books"""
+        moves = super(StockMove, self)._action_done(
+            cancel_backorder=cancel_backorder)
+        books = moves.mapped("product_id").filtered(
+            lambda product: product.categ_id.book_categ or
+            product.books_issued)
+        books._refresh_books_available()
+        self.env["library.book.request"]._dispatch_holds(books)
+        return moves
+
 
 class StockPicking(models.Model):
     _inherit = "stock.picking"
@@ -1,3 +1,4 @@
 # See LICENSE file for full copyright and licensing details.
 
 from . import test_library
+from . import test_ebook_download
@@ -0,0 +1,68 @@
+# See LICENSE file for full copyright and licensing details.
+
+import base64
+
+from odoo.tests import common, tagged
+
+EBOOK = b"%PDF-1.4 library ebook"
+
+
+@tagged("post_install", "-at_install")
+class TestEbookDownload(common.HttpCase):
+    def setUp(self):
+        super(TestEbookDownload, self).setUp()
+        categ = self.env["product.category"].search(
+            [("book_categ", "=", True)], limit=1
+        )
+        self.ebook = self.env["product.product"].create(
+            {
+                "name": "Python EBook",
+                "categ_id": categ.id,
+                "is_ebook": True,
+                "attach_ebook": base64.b64encode(EBOOK),
+            }
+        )
+        card = self.env["library.card"].create(
+            {
+                "code": "C0057",
+                "user": "student",
+                "book_limit": 10,
+                "student_id": self.env.ref("school.demo_student_student_5").id,
+                "roll_no": 2,
+                "standard_id": self.env.ref(
+                    "school.demo_school_standard_2"
+                ).id,
+            }
+        )
+        self.issue = self.env["library.book.issue"].create(
+            {"name": self.ebook.id, "card_id": card.id, "user": "Student"}
+        )
+        self.url = "/library/ebook/%s" % (self.issue.id)
+        self.authenticate("admin", "admin")
+
+    def test_download(self):
+        """The whole e-book is streamed to paid issues"""
+        self.issue.state = "paid"
+        response = self.url_open(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, EBOOK)
+        self.assertEqual(response.headers["Accept-Ranges"], "bytes")
+        response = self.url_open(
+            self.url, headers={"If-None-Match": response.headers["ETag"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_download_range(self):
+        """A range of the e-book is streamed to subscribed issues"""
+        self.issue.state = "subscribe"
+        response = self.url_open(self.url, headers={"Range": "bytes=0-7"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, EBOOK[:8])
+        self.assertEqual(
+            response.headers["Content-Range"], "bytes 0-7/%s" % len(EBOOK)
+        )
+
+    def test_download_forbidden(self):
+        """Issues that are not paid or subscribed can not download"""
+        response = self.url_open(self.url)
+        self.assertEqual(response.status_code, 403)
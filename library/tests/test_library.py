@@ -1,8 +1,13 @@
 # See LICENSE file for full copyright and licensing details.
 
+import base64
+import logging
+import time
 
 from odoo.tests import common
 
+_logger = logging.getLogger(__name__)
+
 
 class TestLibrary(common.TransactionCase):
     def setUp(self):
@@ -147,3 +152,140 @@ class TestLibrary(common.TransactionCase):
     def test_exam(self):
         self.assertEqual(self.library_card.student_id.state, "done")
         self.assertEqual(self.library_book_issue.student_id.state, "done")
+
+    def test_book_counters(self):
+        """Issued and available books follow the issue transitions"""
+        available = self.product_product.books_available
+        stat_obj = self.env["library.circulation.stat"]
+        stat_domain = [
+            ("book_id", "=", self.product_product.id),
+            ("card_id", "=", self.library_card.id),
+        ]
+        stats = stat_obj.search(stat_domain)
+        issue_count = sum(stats.mapped("issue_count"))
+        return_count = sum(stats.mapped("return_count"))
+        card_issue_count = self.library_card.book_issue_count
+        book_issue = self.library_book_issue_obj.create(
+            {
+                "name": self.product_product.id,
+                "card_id": self.library_card.id,
+                "user": "Student",
+            }
+        )
+        book_issue.issue_book()
+        self.assertEqual(self.product_product.books_issued, 1)
+        self.assertEqual(self.product_product.books_available, available - 1)
+        book_issue.return_book()
+        self.assertEqual(self.product_product.books_issued, 0)
+        self.assertEqual(self.product_product.books_available, available)
+        history = self.env["book.history"].search(
+            [("book_issue_id", "=", book_issue.id)], order="id"
+        )
+        self.assertEqual(
+            history.mapped("book_issue_state"), ["draft", "issue", "return"]
+        )
+        self.assertEqual(history[1].card_id, self.library_card)
+        stats = stat_obj.search(stat_domain)
+        self.assertEqual(sum(stats.mapped("issue_count")), issue_count + 1)
+        self.assertEqual(sum(stats.mapped("return_count")), return_count + 1)
+        self.assertEqual(stats.mapped("overdue_rate"), [0.0] * len(stats))
+        self.library_card.invalidate_cache(["book_issue_count"])
+        self.assertEqual(
+            self.library_card.book_issue_count, card_issue_count + 1
+        )
+
+    def test_hold_queue(self):
+        """Requests wait for a copy and are allocated in queue order"""
+        self.product_product.write(
+            {"availability": "available", "books_available": 0}
+        )
+        hold = self.library_book_request_obj.create(
+            {
+                "card_id": self.library_card.id,
+                "type": "existing",
+                "name": self.product_product.id,
+            }
+        )
+        hold.confirm_book_request()
+        self.assertEqual(hold.state, "waiting")
+        self.assertEqual(hold.queue_position, 1)
+        self.product_product.books_available = 1
+        self.library_book_request_obj._dispatch_holds(self.product_product)
+        self.assertEqual(hold.state, "confirm")
+        self.assertEqual(hold.issue_id.state, "issue")
+
+    def test_ebook_request(self):
+        """E-book issues download the file of the book"""
+        ebook = self.product_product_obj.create(
+            {
+                "name": "Python EBook",
+                "categ_id": self.product_product.categ_id.id,
+                "is_ebook": True,
+                "attach_ebook": base64.b64encode(b"%PDF-1.4 ebook"),
+            }
+        )
+        request = self.library_book_request_obj.create(
+            {
+                "card_id": self.library_card.id,
+                "type": "ebook",
+                "ebook_name": ebook.id,
+            }
+        )
+        request.confirm_book_request()
+        self.assertEqual(request.issue_id.state, "paid")
+        attachment = request.issue_id._get_ebook_attachment()
+        self.assertEqual(attachment.raw, b"%PDF-1.4 ebook")
+
+    def test_bulk_checkout(self):
+        """Scanned books are issued to the cards in one batch"""
+        self.product_product.barcode = "JAVA-001"
+        issues = self.library_book_issue_obj.bulk_checkout(
+            [(self.library_card.code, "JAVA-001")]
+        )
+        self.assertEqual(issues.mapped("state"), ["issue"])
+        self.assertEqual(issues.card_id, self.library_card)
+
+    def test_catalogue_search_benchmark(self):
+        """Ranked catalogue search against the ilike name search"""
+        categ = self.product_product.categ_id
+        self.product_product_obj.create(
+            [
+                {
+                    "name": "Library Book %s" % index,
+                    "categ_id": categ.id,
+                    "isbn": "978%010d" % index,
+                    "author": self.library_author.id,
+                }
+                for index in range(2000)
+            ]
+        )
+        start = time.time()
+        ilike_ids = [
+            book_id
+            for book_id, name in self.product_product_obj.name_search(
+                "Book 1999"
+            )
+        ]
+        ilike_time = time.time() - start
+        start = time.time()
+        ranked_ids = self.product_product_obj._search_catalogue("Book 1999")
+        catalogue_time = time.time() - start
+        _logger.info(
+            "Catalogue search %.4fs, ilike name search %.4fs",
+            catalogue_time,
+            ilike_time,
+        )
+        book = self.product_product_obj.browse(ranked_ids[0])
+        self.assertEqual(book.name, "Library Book 1999")
+        self.assertIn(book.id, ilike_ids)
+        isbn_ids = self.product_product_obj._search_catalogue("9780000001999")
+        self.assertEqual(isbn_ids[0], book.id)
+        catalogue = self.product_product_obj.with_context(
+            library_catalogue_search=True
+        )
+        results = catalogue.name_search(
+            "Library Book", [("isbn", "=", "9780000001999")], limit=5
+        )
+        self.assertEqual([book_id for book_id, name in results], [book.id])
+        results = catalogue.name_search("Library Book 19", operator="=")
+        self.assertFalse(results)
@@ -1,3 +1,4 @@
 # See LICENSE file for full copyright and licensing details.
 
 from . import terminate_reason
+from . import bulk_checkout
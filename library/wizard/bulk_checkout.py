@@ -0,0 +1,49 @@
+# See LICENSE file for full copyright and licensing details.
+
+import re
+
+from odoo import _, fields, models
+from odoo.exceptions import ValidationError
+
+
+class LibraryBulkCheckout(models.TransientModel):
+    """Issue scanned books to library cards in one batch"""
+
+    _name = "library.bulk.checkout"
+    _description = "Library Bulk Checkout"
+
+    card_id = fields.Many2one("library.card", "Card No",
+        help="Card used for the lines with only a book code")
+    scan_data = fields.Text("Scanned Codes", required=True,
+        help="One line per book: card number and book barcode or ISBN, "
+        "or only the book code when a card is selected")
+
+    def _get_scans(self):
+        """Return the (card number, book code) pairs of the scanned lines"""
+        self.ensure_one()
+        scans = []
+        for line in (self.scan_data or "").splitlines():
+            codes = [code for code in re.split(r"[\s,;]+", line) if code]
+            if len(codes) == 1 and self.card_id:
+                codes.insert(0, self.card_id.code)
+            if not codes:
+                continue
+            if len(codes) != 2:
+                raise ValidationError(_("Invalid scanned line: %s") % line)
+            scans.append(tuple(codes))
+        if not scans:
+            raise ValidationError(_("Kindly, Scan the books to issue!"))
+        return scans
+
+    def action_checkout(self):
+        """Issue all scanned books and show the book issues"""
+        self.ensure_one()
+        issues = self.env["library.book.issue"].bulk_checkout(
+            self._get_scans())
+        return {
+            "name": _("Book Issue"),
+            "res_model": "library.book.issue",
+            "type": "ir.actions.act_window",
+            "view_mode": "tree,form",
+            "domain": [("id", "in", issues.ids)],
+        }
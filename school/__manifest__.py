@@ -16,11 +16,13 @@
         "security/ir.model.access.csv",
         "data/student_sequence.xml",
         "data/mail_template.xml",
+        "data/dues_schedular.xml",
         "wizard/terminate_reason_view.xml",
         "views/student_view.xml",
         "views/school_view.xml",
         "views/teacher_view.xml",
         "views/parent_view.xml",
+        "views/student_dues_view.xml",
         "wizard/assign_roll_no_wizard.xml",
         "wizard/move_standards_view.xml",
         "report/report_view.xml",
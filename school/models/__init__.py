@@ -9,3 +9,5 @@ from . import student
 from . import teacher
 from . import parent
 from . import res_users
+from . import account
+from . import dues
@@ -0,0 +1,65 @@
+# See LICENSE file for full copyright and licensing details.
+
+from odoo import api, models
+
+PAID_STATES = ("paid", "in_payment")
+
+
+class AccountMove(models.Model):
+    _inherit = "account.move"
+
+    def _get_school_payment_vals(self):
+        """Return the paid flag, paid amount and due amount of invoices"""
+        return {
+            invoice.id: {
+                "paid": invoice.payment_state in PAID_STATES,
+                "paid_amount": invoice.amount_total - invoice.amount_residual,
+                "due_amount": invoice.amount_residual,
+            }
+            for invoice in self
+        }
+
+    def _sync_school_payments(self):
+        """Update school records paid through the invoices.
+
+        Called once with every invoice whose reconciliation changed, from
+        the payment wizard as well as from bank statement reconciliation.
+        Modules override it to update the records linked to the invoices
+        in one pass.
+        """
+        return True
+
+    def _sync_school_payments_and_dues(self):
+        """Sync school payments then refresh the dues of their students"""
+        if not self:
+            return
+        self.with_context(defer_dues_refresh=True)._sync_school_payments()
+        students = self.env["student.student"].search(
+            [("partner_id", "in", self.mapped("partner_id").ids)]
+        )
+        self.env["student.dues.summary"]._refresh_dues(students.ids)
+
+
+class AccountPartialReconcile(models.Model):
+    _inherit = "account.partial.reconcile"
+
+    def _get_school_invoices(self):
+        """Return the invoices reconciled by the partials"""
+        moves = self.mapped("debit_move_id.move_id") | self.mapped(
+            "credit_move_id.move_id"
+        )
+        return moves.filtered(lambda move: move.is_invoice())
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Inherited create method to sync payments of school records"""
+        partials = super(AccountPartialReconcile, self).create(vals_list)
+        partials._get_school_invoices()._sync_school_payments_and_dues()
+        return partials
+
+    def unlink(self):
+        """Inherited unlink method to sync payments of school records"""
+        invoices = self._get_school_invoices()
+        res = super(AccountPartialReconcile, self).unlink()
+        invoices.exists()._sync_school_payments_and_dues()
+        return res
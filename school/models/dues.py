@@ -0,0 +1,130 @@
+# See LICENSE file for full copyright and licensing details.
+
+from odoo import api, fields, models
+
+
+class StudentDuesSummary(models.Model):
+    """Outstanding dues of a student per academic year, aged in buckets."""
+
+    _name = "student.dues.summary"
+    _description = "Student Dues Summary"
+    _rec_name = "student_id"
+    _order = "amount_due desc"
+
+    student_id = fields.Many2one(
+        "student.student",
+        "Student",
+        readonly=True,
+        index=True,
+        ondelete="cascade",
+        help="Student having outstanding dues",
+    )
+    year_id = fields.Many2one(
+        "academic.year",
+        "Academic Year",
+        readonly=True,
+        ondelete="cascade",
+        help="Academic year of the dues",
+    )
+    amount_current = fields.Float(
+        "Current", readonly=True, help="Dues overdue less than 30 days"
+    )
+    amount_30 = fields.Float(
+        "30 Days", readonly=True, help="Dues overdue from 30 to 59 days"
+    )
+    amount_60 = fields.Float(
+        "60 Days", readonly=True, help="Dues overdue from 60 to 89 days"
+    )
+    amount_90 = fields.Float(
+        "90+ Days", readonly=True, help="Dues overdue 90 days or more"
+    )
+    amount_due = fields.Float(
+        "Total Due", readonly=True, help="Total outstanding dues"
+    )
+
+    @api.model
+    def _get_dues_queries(self):
+        """Return the SQL queries of outstanding dues.
+
+        Each query selects ``student_id``, ``due_date`` and ``amount``
+        columns. Modules holding student dues extend this method.
+        """
+        return []
+
+    @api.model
+    def _refresh_dues(self, student_ids=None):
+        """Rebuild the summary of the students, or of all students"""
+        queries = self._get_dues_queries()
+        if student_ids is not None and not student_ids:
+            return
+        self.flush()
+        where = ""
+        params = {"today": fields.Date.context_today(self)}
+        if student_ids is not None:
+            where = "AND dues.student_id IN %(student_ids)s"
+            params["student_ids"] = tuple(student_ids)
+            self._cr.execute(
+                "DELETE FROM student_dues_summary "
+                "WHERE student_id IN %(student_ids)s",
+                params,
+            )
+        else:
+            self._cr.execute("DELETE FROM student_dues_summary")
+        if queries:
+            self._cr.execute(
+                """
+                INSERT INTO student_dues_summary (
+                    student_id, year_id, amount_current, amount_30,
+                    amount_60, amount_90, amount_due, create_uid,
+                    create_date, write_uid, write_date
+                )
+                SELECT
+                    aged.student_id,
+                    aged.year_id,
+                    COALESCE(SUM(aged.amount) FILTER (
+                        WHERE aged.age < 30), 0),
+                    COALESCE(SUM(aged.amount) FILTER (
+                        WHERE aged.age >= 30 AND aged.age < 60), 0),
+                    COALESCE(SUM(aged.amount) FILTER (
+                        WHERE aged.age >= 60 AND aged.age < 90), 0),
+                    COALESCE(SUM(aged.amount) FILTER (
+                        WHERE aged.age >= 90), 0),
+                    SUM(aged.amount),
+                    %(uid)s,
+                    NOW() AT TIME ZONE 'UTC',
+                    %(uid)s,
+                    NOW() AT TIME ZONE 'UTC'
+                FROM (
+                    SELECT
+                        dues.student_id,
+                        ay.id AS year_id,
+                        dues.amount,
+                        %(today)s::date
+                            - COALESCE(dues.due_date, %(today)s::date) AS age
+                    FROM
+                        ({queries}) AS dues
+                        LEFT JOIN academic_year ay ON
+                            dues.due_date BETWEEN ay.date_start
+                            AND ay.date_stop
+                    WHERE
+                        dues.amount > 0 {where}
+                ) AS aged
+                GROUP BY aged.student_id, aged.year_id
+                """.format(
+                    queries=" UNION ALL ".join(queries), where=where
+                ),
+                dict(params, uid=self.env.uid),
+            )
+        self.invalidate_cache()
+
+    @api.model
+    def _cron_rebuild_dues(self):
+        """Nightly rebuild of the summary of all students"""
+        self._refresh_dues()
+
+    @api.model
+    def _get_students_with_dues(self, student_ids):
+        """Return the students among the given ones having dues"""
+        return self.search(
+            [("student_id", "in", student_ids), ("amount_due", ">", 0)]
+        ).mapped("student_id")
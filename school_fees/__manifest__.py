@@ -2,7 +2,7 @@
 
 {
     "name": "Fees Management for Education ERP",
-    "version": "15.0.1.0.0",
+    "version": "15.0.1.0.1",
     "author": "Serpent Consulting Services Pvt. Ltd.",
     "website": "http://www.serpentcs.com",
     "category": "School Management",
@@ -16,8 +16,11 @@
         "security/security_fees.xml",
         "data/school_fees_sequence.xml",
         "data/mail_template.xml",
+        "data/fees_reminder_schedular.xml",
+        "data/fees_report_job_schedular.xml",
         "data/data.xml",
         "views/school_fees_view.xml",
+        "views/fees_report_job_view.xml",
         "report/student_payslip.xml",
         "report/student_fees_register.xml",
         "report/report_view.xml",
@@ -0,0 +1,18 @@
+# See LICENSE file for full copyright and licensing details.
+
+
+def migrate(cr, version):
+    """Reload the fees reminder template with the dunning subject and body.
+
+    The template is loaded with noupdate, so it is released for this
+    update only and the data file marks it noupdate again.
+    """
+    if not version:
+        return
+    cr.execute(
+        """
+        UPDATE ir_model_data
+        SET noupdate = FALSE
+        WHERE module = 'school_fees' AND name = 'fees_reminder_email'
+        """
+    )
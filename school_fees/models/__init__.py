@@ -1,3 +1,4 @@
 # See LICENSE file for full copyright and licensing details.
 
 from . import school_fees
+from . import fees_report_job
@@ -0,0 +1,106 @@
+# See LICENSE file for full copyright and licensing details.
+
+from collections import namedtuple
+
+# Fee line of a structure with its base amount and the payslip line values.
+PlanLine = namedtuple("PlanLine", "line_id amount vals")
+
+# Compiled rule: kind is "override", "sibling" or "scholarship", empty
+# standard/line sets match everything.
+PlanRule = namedtuple(
+    "PlanRule",
+    "name kind standard_ids student_ids line_ids amount_type value "
+    "min_siblings",
+)
+
+
+class FeesPlan(object):
+    """Pricing plan compiled from a fees structure and its rules.
+
+    Rules are applied in sequence on the base amount of every fee line: an
+    override replaces the amount, sibling and scholarship rules discount it
+    by a percentage or a fixed amount. Students sharing the same profile,
+    i.e. standard, sibling rank and scholarships, get the same prices, so
+    each profile is priced once however many students share it.
+    """
+
+    def __init__(self, lines, rules, installment_count=1):
+        self.lines = list(lines)
+        self.rules = list(rules)
+        self.installment_count = max(installment_count, 1)
+        self.max_rank = max(
+            [
+                rule.min_siblings
+                for rule in self.rules
+                if rule.kind == "sibling"
+            ]
+            or [1]
+        )
+        self._prices = {}
+
+    def _get_profile(self, student_id, standard_id, sibling_rank):
+        scholarships = frozenset(
+            index
+            for index, rule in enumerate(self.rules)
+            if rule.kind == "scholarship" and student_id in rule.student_ids
+        )
+        return standard_id, min(sibling_rank, self.max_rank), scholarships
+
+    def _rule_applies(self, index, rule, profile):
+        standard_id, sibling_rank, scholarships = profile
+        if rule.standard_ids and standard_id not in rule.standard_ids:
+            return False
+        if rule.kind == "sibling":
+            return sibling_rank >= rule.min_siblings
+        if rule.kind == "scholarship":
+            return index in scholarships
+        return True
+
+    def _price_profile(self, profile):
+        """Return ``[(amount, rule names)]`` of the lines for a profile"""
+        prices = []
+        for line in self.lines:
+            amount = line.amount
+            names = []
+            for index, rule in enumerate(self.rules):
+                if rule.line_ids and line.line_id not in rule.line_ids:
+                    continue
+                if not self._rule_applies(index, rule, profile):
+                    continue
+                if rule.kind == "override":
+                    if rule.amount_type == "percent":
+                        amount = line.amount * rule.value / 100.0
+                    else:
+                        amount = rule.value
+                elif rule.amount_type == "percent":
+                    amount -= amount * rule.value / 100.0
+                else:
+                    amount -= rule.value
+                names.append(rule.name)
+            prices.append((max(round(amount, 2), 0.0), names))
+        return prices
+
+    def price(self, student_id, standard_id, sibling_rank=1):
+        """Return the priced lines of a student, cached per profile"""
+        profile = self._get_profile(student_id, standard_id, sibling_rank)
+        if profile not in self._prices:
+            self._prices[profile] = self._price_profile(profile)
+        return self._prices[profile]
+
+    def get_line_vals(self, prices, installment=0):
+        """Return payslip line values for one installment of the prices.
+
+        Amounts are split evenly between the installments, the last one
+        takes the rounding difference.
+        """
+        count = self.installment_count
+        vals_list = []
+        for line, (amount, names) in zip(self.lines, prices):
+            part = round(amount / count, 2)
+            if installment == count - 1:
+                part = round(amount - part * (count - 1), 2)
+            vals = dict(line.vals, amount=part)
+            if names:
+                vals["description"] = ", ".join(names)
+            vals_list.append(vals)
+        return vals_list
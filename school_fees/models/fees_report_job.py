@@ -0,0 +1,248 @@
+# See LICENSE file for full copyright and licensing details.
+
+import base64
+import logging
+import threading
+import time
+
+from odoo import _, api, fields, models
+from odoo.exceptions import ValidationError
+from odoo.tools.pdf import merge_pdf
+
+_logger = logging.getLogger(__name__)
+
+REPORTS = {
+    "register": "school_fees.report_student_fees_register_qweb",
+    "payslip": "school_fees.report_student_payslip_qweb",
+}
+
+
+class StudentFeesReportJob(models.Model):
+    """Fees report rendered in parts by a background job"""
+
+    _name = "student.fees.report.job"
+    _description = "Fees Report Job"
+    _order = "id desc"
+
+    name = fields.Char("Name", required=True, help="Name of the report")
+    report_type = fields.Selection(
+        [("register", "Fees Register"), ("payslip", "Payslips")],
+        "Report",
+        required=True,
+        help="Report to render",
+    )
+    register_id = fields.Many2one(
+        "student.fees.register",
+        "Register",
+        ondelete="cascade",
+        help="Fees register of the report",
+    )
+    payslip_ids = fields.Many2many(
+        "student.payslip",
+        "student_fees_report_job_payslip_rel",
+        "job_id",
+        "slip_id",
+        "Payslips",
+        help="Payslips rendered in the report",
+    )
+    chunk_size = fields.Integer(
+        "Payslips Per Part",
+        default=100,
+        help="Number of payslips rendered in one part",
+    )
+    processed_count = fields.Integer(
+        "Processed", readonly=True, help="Number of payslips rendered"
+    )
+    total_count = fields.Integer(
+        "Total", readonly=True, help="Number of payslips to render"
+    )
+    progress = fields.Float(
+        "Progress", compute="_compute_progress", help="Rendered percentage"
+    )
+    state = fields.Selection(
+        [
+            ("queued", "Queued"),
+            ("running", "Running"),
+            ("done", "Done"),
+            ("failed", "Failed"),
+        ],
+        "State",
+        readonly=True,
+        default="queued",
+        help="State of the report job",
+    )
+    part_ids = fields.Many2many(
+        "ir.attachment",
+        "student_fees_report_job_part_rel",
+        "job_id",
+        "attachment_id",
+        "Parts",
+        readonly=True,
+        help="Rendered parts waiting to be merged",
+    )
+    attachment_id = fields.Many2one(
+        "ir.attachment",
+        "Report File",
+        readonly=True,
+        ondelete="set null",
+        help="Merged report",
+    )
+    report_file = fields.Binary(
+        related="attachment_id.datas", string="Report", readonly=True
+    )
+    report_filename = fields.Char(
+        related="attachment_id.name", string="File Name", readonly=True
+    )
+    error = fields.Text("Error", readonly=True, help="Rendering error")
+    user_id = fields.Many2one(
+        "res.users",
+        "Requested By",
+        readonly=True,
+        default=lambda self: self.env.user,
+        help="User who requested the report",
+    )
+
+    @api.depends("processed_count", "total_count")
+    def _compute_progress(self):
+        """Method to compute the rendered percentage"""
+        for rec in self:
+            rec.progress = (
+                rec.total_count
+                and 100.0 * rec.processed_count / rec.total_count
+                or 0.0
+            )
+
+    @api.constrains("chunk_size")
+    def check_chunk_size(self):
+        """Method to check the size of a part"""
+        for rec in self:
+            if rec.chunk_size <= 0:
+                raise ValidationError(
+                    _("Payslips per part should be greater than 0!")
+                )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Inherited create method to start the background job"""
+        jobs = super(StudentFeesReportJob, self).create(vals_list)
+        for job in jobs:
+            job.total_count = len(job._get_payslips())
+            if not job.total_count:
+                raise ValidationError(_("There is no payslip to print!"))
+        self.env.ref(
+            "school_fees.ir_cron_fees_report_job"
+        ).sudo()._trigger()
+        return jobs
+
+    def _get_payslips(self):
+        self.ensure_one()
+        if self.report_type == "register":
+            return self.register_id.line_ids
+        return self.payslip_ids
+
+    def _render_part(self):
+        """Render the next part of the job and store it as attachment"""
+        self.ensure_one()
+        payslips = self._get_payslips()
+        start = self.processed_count
+        chunk = payslips[start : start + self.chunk_size]
+        report = self.env.ref(REPORTS[self.report_type])
+        if self.report_type == "register":
+            data = {
+                "slip_ids": chunk.ids,
+                "offset": start,
+                "last": start + len(chunk) >= len(payslips),
+            }
+            pdf = report._render_qweb_pdf(self.register_id.ids, data=data)[0]
+        else:
+            pdf = report._render_qweb_pdf(chunk.ids)[0]
+        part = self.env["ir.attachment"].create(
+            {
+                "name": "%s-%s.pdf" % (self.name, len(self.part_ids) + 1),
+                "datas": base64.b64encode(pdf),
+                "res_model": self._name,
+                "res_id": self.id,
+                "mimetype": "application/pdf",
+            }
+        )
+        self.write(
+            {
+                "state": "running",
+                "processed_count": start + len(chunk),
+                "part_ids": [(4, part.id)],
+            }
+        )
+
+    def _merge_parts(self):
+        """Merge the parts into the final report"""
+        self.ensure_one()
+        parts = self.part_ids.sorted("id")
+        pdf = merge_pdf([base64.b64decode(part.datas) for part in parts])
+        res_model, res_id = self._name, self.id
+        if self.report_type == "register":
+            res_model, res_id = "student.fees.register", self.register_id.id
+        attachment = self.env["ir.attachment"].create(
+            {
+                "name": "%s.pdf" % (self.name),
+                "datas": base64.b64encode(pdf),
+                "res_model": res_model,
+                "res_id": res_id,
+                "mimetype": "application/pdf",
+            }
+        )
+        self.write(
+            {
+                "state": "done",
+                "attachment_id": attachment.id,
+                "part_ids": [(5,)],
+            }
+        )
+        parts.unlink()
+
+    @api.model
+    def _cron_process_jobs(self, time_budget=60):
+        """Render queued report jobs part by part within the time budget.
+
+        Every part is committed so the progress is visible while the job
+        runs, a job left unfinished continues in the next run.
+        """
+        deadline = time.time() + time_budget
+        testing = getattr(threading.current_thread(), "testing", False)
+        while time.time() < deadline:
+            self.flush(["state"])
+            self._cr.execute(
+                """
+                SELECT
+                    id
+                FROM
+                    student_fees_report_job
+                WHERE
+                    state IN ('queued', 'running')
+                ORDER BY id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+                """
+            )
+            row = self._cr.fetchone()
+            if not row:
+                return
+            job = self.browse(row[0])
+            try:
+                with self._cr.savepoint():
+                    if job.processed_count < job.total_count:
+                        job._render_part()
+                    else:
+                        job._merge_parts()
+            except Exception as error:
+                _logger.exception("Fees report job %s failed", job.id)
+                job.write({"state": "failed", "error": str(error)})
+            if not testing:
+                self._cr.commit()
+        self.env.ref("school_fees.ir_cron_fees_report_job")._trigger()
+
+    def action_retry(self):
+        """Restart the failed jobs from the last rendered part"""
+        self.write({"state": "running", "error": False})
+        self.env.ref(
+            "school_fees.ir_cron_fees_report_job"
+        ).sudo()._trigger()
@@ -1,7 +1,12 @@
 # See LICENSE file for full copyright and licensing details.
 
+from dateutil.relativedelta import relativedelta
+
 from odoo import _, api, fields, models
 from odoo.exceptions import ValidationError
+from odoo.tools.sql import create_index
+
+from .fees_plan import FeesPlan, PlanLine, PlanRule
 
 
 class StudentFeesRegister(models.Model):
@@ -10,12 +15,52 @@ class StudentFeesRegister(models.Model):
     _name = "student.fees.register"
     _description = "Student fees Register"
 
-    @api.depends("line_ids")
+    @api.depends(
+        "line_ids",
+        "line_ids.total",
+        "line_ids.paid_amount",
+        "line_ids.due_amount",
+        "line_ids.state",
+    )
     def _compute_total_amount(self):
-        """Method to compute total amount"""
+        """Method to compute the register totals with one aggregate query"""
+        totals = {}
+        register_ids = [rec._origin.id for rec in self if rec._origin.id]
+        if register_ids:
+            self.env["student.payslip"].flush(
+                ["register_id", "total", "paid_amount", "due_amount", "state"]
+            )
+            self._cr.execute(
+                """
+                SELECT
+                    register_id,
+                    COALESCE(SUM(total), 0),
+                    COALESCE(SUM(paid_amount), 0),
+                    COALESCE(SUM(due_amount) FILTER (
+                        WHERE state IN ('confirm', 'pending')), 0),
+                    COUNT(*) FILTER (WHERE state = 'draft'),
+                    COUNT(*) FILTER (WHERE state = 'confirm'),
+                    COUNT(*) FILTER (WHERE state = 'pending'),
+                    COUNT(*) FILTER (WHERE state = 'paid')
+                FROM
+                    student_payslip
+                WHERE
+                    register_id IN %s
+                GROUP BY register_id
+                """,
+                (tuple(register_ids),),
+            )
+            totals = {row[0]: row[1:] for row in self._cr.fetchall()}
         for rec in self:
-            total_amt = sum(line.total for line in rec.line_ids)
-            rec.total_amount = total_amt
+            (
+                rec.total_amount,
+                rec.paid_amount,
+                rec.due_amount,
+                rec.draft_count,
+                rec.confirm_count,
+                rec.pending_count,
+                rec.paid_count,
+            ) = totals.get(rec._origin.id, (0.0, 0.0, 0.0, 0, 0, 0, 0))
 
     name = fields.Char("Name", required=True, help="Enter Name")
     date = fields.Date(
@@ -34,7 +79,46 @@ class StudentFeesRegister(models.Model):
         "student.payslip", "register_id", "PaySlips", help="Student payslips"
     )
     total_amount = fields.Float(
-        "Total", compute="_compute_total_amount", help="Fee total amounts"
+        "Total",
+        compute="_compute_total_amount",
+        store=True,
+        help="Fee total amounts",
+    )
+    paid_amount = fields.Float(
+        "Collected",
+        compute="_compute_total_amount",
+        store=True,
+        help="Fee amounts paid by the students",
+    )
+    due_amount = fields.Float(
+        "Due",
+        compute="_compute_total_amount",
+        store=True,
+        help="Fee amounts remaining to be paid",
+    )
+    draft_count = fields.Integer(
+        "Draft Payslips",
+        compute="_compute_total_amount",
+        store=True,
+        help="Number of draft payslips",
+    )
+    confirm_count = fields.Integer(
+        "Confirmed Payslips",
+        compute="_compute_total_amount",
+        store=True,
+        help="Number of confirmed payslips",
+    )
+    pending_count = fields.Integer(
+        "Pending Payslips",
+        compute="_compute_total_amount",
+        store=True,
+        help="Number of invoiced payslips waiting for payment",
+    )
+    paid_count = fields.Integer(
+        "Paid Payslips",
+        compute="_compute_total_amount",
+        store=True,
+        help="Number of paid payslips",
     )
     state = fields.Selection(
         [("draft", "Draft"), ("confirm", "Confirm")],
@@ -72,11 +156,48 @@ class StudentFeesRegister(models.Model):
         """Changes the state to draft"""
         self.state = "draft"
 
+    def fees_register_invoice(self):
+        """Generate invoices of all confirmed payslips of the registers"""
+        payslips = self.mapped("line_ids").filtered(
+            lambda slip: slip.state == "confirm"
+        )
+        if not payslips:
+            raise ValidationError(_("There is no confirmed payslip to pay!"))
+        return payslips.student_pay_fees()
+
+    def _get_report_job_action(self, jobs):
+        return {
+            "name": _("Fees Report Jobs"),
+            "view_mode": "tree,form",
+            "res_model": "student.fees.report.job",
+            "type": "ir.actions.act_window",
+            "domain": [("id", "in", jobs.ids)],
+        }
+
+    def action_print_background(self):
+        """Render the fees register reports in a background job"""
+        jobs = self.env["student.fees.report.job"].create(
+            [
+                {
+                    "name": _("Fees Register %s") % (rec.number or rec.name),
+                    "report_type": "register",
+                    "register_id": rec.id,
+                }
+                for rec in self
+            ]
+        )
+        return self._get_report_job_action(jobs)
+
     def fees_register_confirm(self):
-        """Method to confirm payslip"""
+        """Method to create the priced payslips of the register students.
+
+        The fees structure is compiled once per register and applied to
+        all students, one payslip is created per student and installment.
+        """
         stud_obj = self.env["student.student"]
         slip_obj = self.env["student.payslip"]
         school_std_obj = self.env["school.standard"]
+        structure_obj = self.env["student.fees.structure"]
         for rec in self:
             if not rec.journal_id and not self._context.get('is_demo_record'):
                 raise ValidationError(_("Kindly, Select Account Journal!"))
@@ -85,42 +206,69 @@ class StudentFeesRegister(models.Model):
             school_std_rec = school_std_obj.search(
                 [("standard_id", "=", rec.standard_id.id)]
             )
-            for stu in stud_obj.search(
+            students = stud_obj.search(
                 [
                     ("standard_id", "in", school_std_rec.ids),
                     ("state", "=", "done"),
                 ]
-            ):
-                # Check if payslip exist of student
-                if slip_obj.search(
-                    [("student_id", "=", stu.id), ("date", "=", rec.date)]
-                ):
-                    raise ValidationError(
-                        _(
-                            """There exists a Fees record for: %s for same date.!
+            )
+            plan = rec.fees_structure._get_fees_plan()
+            interval = rec.fees_structure.installment_interval
+            dates = [
+                rec.date + relativedelta(months=installment * interval)
+                for installment in range(plan.installment_count)
+            ]
+            # Check if payslip exist of any student
+            existing_slip = slip_obj.search(
+                [("student_id", "in", students.ids), ("date", "in", dates)],
+                limit=1,
+            )
+            if existing_slip:
+                raise ValidationError(
+                    _(
+                        """There exists a Fees record for: %s for same date.!
 """
+                    )
+                    % existing_slip.student_id.name
+                )
+            if students:
+                rec.number = self.env["ir.sequence"].next_by_code(
+                    "student.fees.register"
+                ) or _("New")
+            profiles = structure_obj._get_pricing_profiles(students.ids)
+            slip_vals_list = []
+            for stu_id in students.ids:
+                prices = plan.price(stu_id, *profiles[stu_id])
+                for installment, date in enumerate(dates):
+                    line_vals_list = plan.get_line_vals(prices, installment)
+                    name = rec.name
+                    if len(dates) > 1:
+                        name = "%s (%s/%s)" % (
+                            rec.name,
+                            installment + 1,
+                            len(dates),
                         )
-                        % stu.name
+                    slip_vals_list.append(
+                        {
+                            "student_id": stu_id,
+                            "register_id": rec.id,
+                            "name": name,
+                            "date": date,
+                            "company_id": rec.company_id.id,
+                            "currency_id": rec.company_id.currency_id.id
+                            or False,
+                            "journal_id": rec.journal_id.id,
+                            "fees_structure_id": rec.fees_structure.id,
+                            "total": sum(
+                                vals["amount"] for vals in line_vals_list
+                            ),
+                            "line_ids": [
+                                (0, 0, vals) for vals in line_vals_list
+                            ],
+                        }
                     )
-                else:
-                    rec.number = self.env["ir.sequence"].next_by_code(
-                        "student.fees.register"
-                    ) or _("New")
-                    res = {
-                        "student_id": stu.id,
-                        "register_id": rec.id,
-                        "name": rec.name,
-                        "date": rec.date,
-                        "company_id": rec.company_id.id,
-                        "currency_id": rec.company_id.currency_id.id or False,
-                        "journal_id": rec.journal_id.id,
-                        "fees_structure_id": rec.fees_structure.id or False,
-                    }
-                    slip_rec = slip_obj.create(res)
-                    slip_rec.onchange_student()
-            # Calculate the amount
-            amount = sum([data.total for data in rec.line_ids])
-            rec.write({"total_amount": amount, "state": "confirm"})
+            slip_obj.create(slip_vals_list)
+            rec.state = "confirm"
 
 
 class StudentPayslipLine(models.Model):
@@ -243,6 +391,22 @@ class StudentFeesStructure(models.Model):
         "Fees Structure",
         help="Fee structure line",
     )
+    rule_ids = fields.One2many(
+        "student.fees.rule",
+        "structure_id",
+        "Fee Rules",
+        help="Discounts and overrides applied on the fee lines",
+    )
+    installment_count = fields.Integer(
+        "Installments",
+        default=1,
+        help="Number of payslips the fees are split into",
+    )
+    installment_interval = fields.Integer(
+        "Installment Interval (Months)",
+        default=1,
+        help="Months between two installments",
+    )
 
     _sql_constraints = [
         (
@@ -252,6 +416,176 @@ class StudentFeesStructure(models.Model):
         )
     ]
 
+    @api.constrains("installment_count", "installment_interval")
+    def check_installments(self):
+        """Method to check the installment plan"""
+        for rec in self:
+            if rec.installment_count < 1:
+                raise ValidationError(
+                    _("Installments should be at least 1!")
+                )
+            if rec.installment_count > 1 and rec.installment_interval < 1:
+                raise ValidationError(
+                    _("Installment interval should be at least 1 month!")
+                )
+
+    def _get_fees_plan(self, installments=True):
+        """Compile the fee lines and rules of the structure into a plan"""
+        self.ensure_one()
+        lines = [
+            PlanLine(
+                line.id,
+                line.amount,
+                {
+                    "product_id": line.product_id.id,
+                    "name": line.name,
+                    "code": line.code,
+                    "type": line.type,
+                    "account_id": line.account_id.id,
+                    "currency_id": line.currency_id.id or False,
+                },
+            )
+            for line in self.line_ids
+        ]
+        rules = [
+            PlanRule(
+                rule.name,
+                rule.rule_type,
+                frozenset(rule.standard_ids.ids),
+                frozenset(rule.student_ids.ids),
+                frozenset(rule.fee_line_ids.ids),
+                rule.amount_type,
+                rule.value,
+                rule.min_siblings,
+            )
+            for rule in self.rule_ids
+        ]
+        return FeesPlan(
+            lines, rules, installments and self.installment_count or 1
+        )
+
+    @api.model
+    def _get_pricing_profiles(self, student_ids):
+        """Return ``{student: (standard, sibling rank)}`` of the students.
+
+        The sibling rank of a student is 1 plus the number of older
+        admitted students sharing one of its parents.
+        """
+        if not student_ids:
+            return {}
+        self.env["student.student"].flush(["standard_id", "state"])
+        self._cr.execute(
+            """
+            SELECT
+                s.id,
+                s.standard_id,
+                1 + COUNT(DISTINCT sibling.id)
+            FROM
+                student_student s
+                LEFT JOIN students_parents_rel rel ON rel.student_id = s.id
+                LEFT JOIN students_parents_rel sibling_rel ON
+                    sibling_rel.students_parent_id = rel.students_parent_id
+                    AND sibling_rel.student_id < s.id
+                LEFT JOIN student_student sibling ON
+                    sibling.id = sibling_rel.student_id
+                    AND sibling.state = 'done'
+            WHERE
+                s.id IN %s
+            GROUP BY s.id, s.standard_id
+            """,
+            (tuple(student_ids),),
+        )
+        return {
+            student_id: (standard_id, rank)
+            for student_id, standard_id, rank in self._cr.fetchall()
+        }
+
+
+class StudentFeesRule(models.Model):
+    """Student Fees Rule"""
+
+    _name = "student.fees.rule"
+    _description = "Student Fees Rule"
+    _order = "sequence, id"
+
+    name = fields.Char("Name", required=True, help="Fee rule name")
+    sequence = fields.Integer(
+        "Sequence", default=10, help="Order in which rules are applied"
+    )
+    structure_id = fields.Many2one(
+        "student.fees.structure",
+        "Fees Structure",
+        required=True,
+        ondelete="cascade",
+        help="Fee structure of the rule",
+    )
+    rule_type = fields.Selection(
+        [
+            ("override", "Standard Override"),
+            ("sibling", "Sibling Discount"),
+            ("scholarship", "Scholarship"),
+        ],
+        "Rule Type",
+        required=True,
+        default="override",
+        help="Override replaces the fee amount, sibling discounts and "
+        "scholarships reduce it",
+    )
+    amount_type = fields.Selection(
+        [("percent", "Percentage"), ("fixed", "Fixed Amount")],
+        "Amount Type",
+        required=True,
+        default="percent",
+        help="Value is a percentage of the fee or a fixed amount",
+    )
+    value = fields.Float("Value", digits=(16, 2), help="Rule value")
+    standard_ids = fields.Many2many(
+        "school.standard",
+        "student_fees_rule_standard_rel",
+        "rule_id",
+        "standard_id",
+        "Classes",
+        help="Classes the rule applies to, all classes when empty",
+    )
+    fee_line_ids = fields.Many2many(
+        "student.fees.structure.line",
+        "student_fees_rule_line_rel",
+        "rule_id",
+        "line_id",
+        "Fee Lines",
+        help="Fee lines the rule applies to, all lines when empty",
+    )
+    student_ids = fields.Many2many(
+        "student.student",
+        "student_fees_rule_student_rel",
+        "rule_id",
+        "student_id",
+        "Scholars",
+        help="Students receiving the scholarship",
+    )
+    min_siblings = fields.Integer(
+        "Minimum Sibling Rank",
+        default=2,
+        help="Discount applies from this child of a family onwards",
+    )
+
+    @api.constrains("value", "amount_type")
+    def check_value(self):
+        """Method to check the value of the rule"""
+        for rec in self:
+            if rec.value < 0:
+                raise ValidationError(
+                    _("Value of the fee rule should not be negative!")
+                )
+            if (
+                rec.amount_type == "percent"
+                and rec.rule_type != "override"
+                and rec.value > 100
+            ):
+                raise ValidationError(
+                    _("Discount percentage should not exceed 100!")
+                )
+
 
 class StudentPayslip(models.Model):
     _name = "student.payslip"
@@ -362,6 +696,18 @@ class StudentPayslip(models.Model):
         default=lambda self: self.env.user.company_id,
         help="Related company",
     )
+    reminder_level = fields.Integer(
+        "Reminder Level",
+        readonly=True,
+        copy=False,
+        help="Number of fees reminders sent for the payslip",
+    )
+    last_reminder_date = fields.Date(
+        "Last Reminder Date",
+        readonly=True,
+        copy=False,
+        help="Date of the last fees reminder",
+    )
 
     _sql_constraints = [
         (
@@ -371,6 +717,15 @@ class StudentPayslip(models.Model):
         )
     ]
 
+    def init(self):
+        """Create the index used to pick overdue payslips"""
+        create_index(
+            self._cr,
+            "student_payslip_state_date_index",
+            self._table,
+            ["state", "date"],
+        )
+
     @api.onchange("student_id")
     def onchange_student(self):
         """Method to get standard , division , medium of student selected"""
@@ -402,30 +757,66 @@ class StudentPayslip(models.Model):
             )
             rec.currency_id = currency_id
 
-    def _update_student_vals(self, vals):
-        student_rec = self.env["student.student"].browse(
-            vals.get("student_id")
+    def _get_student_vals(self, student_ids):
+        """Return standard, division and medium of the students by id"""
+        self.env["student.student"].flush(["standard_id", "medium_id"])
+        self.env["school.standard"].flush(["division_id"])
+        self._cr.execute(
+            """
+            SELECT
+                s.id, s.standard_id, ss.division_id, s.medium_id
+            FROM
+                student_student s
+                LEFT JOIN school_standard ss ON ss.id = s.standard_id
+            WHERE
+                s.id IN %s
+            """,
+            (tuple(student_ids),),
         )
-        vals.update(
-            {
-                "standard_id": student_rec.standard_id.id,
-                "division_id": student_rec.standard_id.division_id.id,
-                "medium_id": student_rec.medium_id.id,
+        return {
+            student_id: {
+                "standard_id": standard_id,
+                "division_id": division_id,
+                "medium_id": medium_id,
             }
-        )
+            for student_id, standard_id, division_id, medium_id in (
+                self._cr.fetchall()
+            )
+        }
 
-    @api.model
-    def create(self, vals):
+    def _update_student_vals(self, vals):
+        student_id = vals.get("student_id")
+        vals.update(self._get_student_vals([student_id])[student_id])
+
+    @api.model_create_multi
+    def create(self, vals_list):
         """Inherited create method to assign values from student model"""
-        if vals.get("student_id"):
-            self._update_student_vals(vals)
-        return super(StudentPayslip, self).create(vals)
+        student_ids = {
+            vals["student_id"] for vals in vals_list if vals.get("student_id")
+        }
+        if student_ids:
+            student_vals = self._get_student_vals(student_ids)
+            for vals in vals_list:
+                if vals.get("student_id"):
+                    vals.update(student_vals[vals["student_id"]])
+        return super(StudentPayslip, self).create(vals_list)
 
     def write(self, vals):
         """Inherited write method to update values from student model"""
         if vals.get("student_id"):
             self._update_student_vals(vals)
-        return super(StudentPayslip, self).write(vals)
+        students = self.mapped("student_id")
+        res = super(StudentPayslip, self).write(vals)
+        if not self._context.get("defer_dues_refresh") and set(vals) & {
+            "state",
+            "due_amount",
+            "date",
+            "student_id",
+        }:
+            self.env["student.dues.summary"]._refresh_dues(
+                (students | self.mapped("student_id")).ids
+            )
+        return res
 
     def payslip_draft(self):
         """Change state to draft"""
@@ -435,79 +826,155 @@ class StudentPayslip(models.Model):
         """Change state to paid"""
         self.state = "paid"
 
+    def action_print_background(self):
+        """Render the payslip report in a background job"""
+        jobs = self.env["student.fees.report.job"].create(
+            {
+                "name": _("Payslips"),
+                "report_type": "payslip",
+                "payslip_ids": [(6, 0, self.ids)],
+            }
+        )
+        return self.env["student.fees.register"]._get_report_job_action(jobs)
+
+    def _send_fees_reminder(self):
+        """Queue the next fees reminder of the payslips to the parents.
+
+        Subjects and bodies of all payslips are rendered from one template
+        and queued as mails in one create, the mail scheduler sends them
+        afterwards. The reminder level of the payslips is increased.
+        """
+        template = self.env.ref(
+            "school_fees.fees_reminder_email", raise_if_not_found=False
+        )
+        if not template or not self:
+            return
+        template = template.sudo()
+        subjects = template._render_field("subject", self.ids)
+        bodies = template._render_field("body_html", self.ids)
+        email_from = self.env.user.email or ""
+        mail_vals_list = []
+        for rec in self:
+            emails = [
+                user.email for user in rec.student_id.parent_id if user.email
+            ]
+            if emails:
+                mail_vals_list.append(
+                    {
+                        "subject": subjects[rec.id],
+                        "body_html": bodies[rec.id],
+                        "email_from": email_from,
+                        "email_to": ",".join(emails),
+                        "model": self._name,
+                        "res_id": rec.id,
+                        "auto_delete": True,
+                    }
+                )
+        self.env["mail.mail"].sudo().create(mail_vals_list)
+        today = fields.Date.today()
+        for level in set(self.mapped("reminder_level")):
+            self.filtered(lambda slip: slip.reminder_level == level).write(
+                {"reminder_level": level + 1, "last_reminder_date": today}
+            )
+
+    @api.model
+    def _cron_send_fees_reminder(
+        self, batch_size=500, interval_days=15, max_level=3
+    ):
+        """Send the next reminder of overdue payslips, one batch per run.
+
+        A payslip is overdue once its date and its last reminder are older
+        than the interval, until it reached the last reminder level.
+        """
+        limit_date = fields.Date.today() - relativedelta(days=interval_days)
+        self.flush(["state", "date", "reminder_level", "last_reminder_date"])
+        self._cr.execute(
+            """
+            SELECT
+                id
+            FROM
+                student_payslip
+            WHERE
+                state IN ('confirm', 'pending') AND
+                date <= %(limit_date)s AND
+                COALESCE(reminder_level, 0) < %(max_level)s AND
+                (last_reminder_date IS NULL OR
+                 last_reminder_date <= %(limit_date)s)
+            ORDER BY date, id
+            LIMIT %(batch_size)s
+            """,
+            {
+                "limit_date": limit_date,
+                "max_level": max_level,
+                "batch_size": batch_size,
+            },
+        )
+        payslips = self.browse([row[0] for row in self._cr.fetchall()])
+        payslips._send_fees_reminder()
+        return len(payslips)
+
     def payslip_confirm(self):
-        """Method to confirm payslip"""
+        """Method to confirm payslips in one batch"""
         for rec in self:
             if not rec.journal_id:
                 raise ValidationError(_("Kindly, Select Account Journal!"))
             if not rec.fees_structure_id:
                 raise ValidationError(_("Kindly, Select Fees Structure!"))
-            lines = []
-            for data in rec.fees_structure_id.line_ids or []:
-                line_vals = {
-                    "slip_id": rec.id,
-                    "product_id": data.product_id.id,
-                    "name": data.name,
-                    "code": data.code,
-                    "type": data.type,
-                    "account_id": data.account_id.id,
-                    "amount": data.amount,
-                    "currency_id": data.currency_id.id or False,
-                    "currency_symbol": data.currency_symbol or False,
-                }
-                lines.append((0, 0, line_vals))
-            rec.write({"line_ids": lines})
-            # Compute amount
-            amount = 0
-            amount = sum(data.amount for data in rec.line_ids)
-            rec.register_id.write({"total_amount": rec.total})
-            rec.write(
+        if not self:
+            return
+        # Price the payslips created without lines, the plan of each
+        # structure is compiled once for all its payslips.
+        to_price = self.filtered(lambda slip: not slip.line_ids)
+        profiles = self.env["student.fees.structure"]._get_pricing_profiles(
+            to_price.mapped("student_id").ids
+        )
+        line_vals_list = []
+        for structure in to_price.mapped("fees_structure_id"):
+            plan = structure._get_fees_plan(installments=False)
+            for rec in to_price.filtered(
+                lambda slip: slip.fees_structure_id == structure
+            ):
+                prices = plan.price(
+                    rec.student_id.id, *profiles[rec.student_id.id]
+                )
+                line_vals_list.extend(
+                    dict(vals, slip_id=rec.id)
+                    for vals in plan.get_line_vals(prices)
+                )
+        self.env["student.payslip.line"].create(line_vals_list)
+        # Compute amount
+        self.env["student.payslip.line"].flush(["slip_id", "amount"])
+        self._cr.execute(
+            """
+            SELECT
+                slip_id, SUM(amount)
+            FROM
+                student_payslip_line
+            WHERE
+                slip_id IN %s
+            GROUP BY slip_id
+            """,
+            (tuple(self.ids),),
+        )
+        amounts = dict(self._cr.fetchall())
+        slips_by_vals = {}
+        for rec in self:
+            key = (
+                amounts.get(rec.id, 0.0),
+                rec.company_id.currency_id.id or False,
+            )
+            slips_by_vals.setdefault(key, self.browse())
+            slips_by_vals[key] |= rec
+        for (amount, currency_id), slips in slips_by_vals.items():
+            slips.write(
                 {
                     "total": amount,
                     "state": "confirm",
                     "due_amount": amount,
-                    "currency_id": rec.company_id.currency_id.id or False,
+                    "currency_id": currency_id,
                 }
             )
-            template = (
-                self.env["mail.template"]
-                .sudo()
-                .search([("name", "ilike", "Fees Reminder")], limit=1)
-            )
-            if template:
-                for user in rec.student_id.parent_id:
-                    subject = _("Fees Reminder")
-                    if user.email:
-                        body = _(
-                            """
-                        <div>
-                            <p>Dear """
-                            + str(user.display_name)
-                            + """,
-                            <br/><br/>
-                            We are getting in touch as school fees due on """
-                            + str(rec.date)
-                            + """ remain unpaid for """
-                            + str(rec.student_id.display_name)
-                            + """.
-                            <br/><br/>
-                            We kindly ask that you arrange to pay the """
-                            + str(rec.due_amount)
-                            + """ balance as soon as possible.
-                            <br/><br/>
-                            Thank You.
-                        </div>"""
-                        )
-                        template.send_mail(
-                            rec.id,
-                            email_values={
-                                "email_from": self.env.user.email or "",
-                                "email_to": user.email,
-                                "subject": subject,
-                                "body_html": body,
-                            },
-                            force_send=True,
-                        )
+        self._send_fees_reminder()
 
     def invoice_view(self):
         """View number of invoice of student"""
@@ -530,151 +997,174 @@ class StudentPayslip(models.Model):
                 action = {"type": "ir.actions.act_window_close"}
         return action
 
+    def _get_move_line_vals(self, rate):
+        """Return the two journal item values of a payslip entry"""
+        self.ensure_one()
+        company_currency = self.company_id.currency_id
+        currency = self.currency_id or company_currency
+        partner = self.student_id.partner_id
+        company_partner = self.company_id.partner_id
+        if self.type in ("in_invoice", "out_refund"):
+            account_id = partner.property_account_payable_id.id
+            comapny_ac_id = company_partner.property_account_receivable_id.id
+            sign = -1
+        else:
+            account_id = partner.property_account_receivable_id.id
+            comapny_ac_id = company_partner.property_account_payable_id.id
+            sign = 1
+        balance = sign * company_currency.round(self.total * rate)
+        amount_currency = sign * self.total
+        if currency == company_currency:
+            amount_currency = balance
+        line_vals = {
+            "name": self.name or "/",
+            "partner_id": partner.id,
+            "currency_id": currency.id,
+        }
+        return [
+            (
+                0,
+                0,
+                dict(
+                    line_vals,
+                    account_id=account_id,
+                    debit=balance > 0 and balance or 0.0,
+                    credit=balance < 0 and -balance or 0.0,
+                    amount_currency=amount_currency,
+                ),
+            ),
+            (
+                0,
+                0,
+                dict(
+                    line_vals,
+                    account_id=comapny_ac_id,
+                    debit=balance < 0 and -balance or 0.0,
+                    credit=balance > 0 and balance or 0.0,
+                    amount_currency=-amount_currency,
+                ),
+            ),
+        ]
+
     def action_move_create(self):
-        cur_obj = self.env["res.currency"]
+        """Create and post the journal entries of the payslips in batch.
+
+        Payslips are grouped by (journal, currency, date) so the currency
+        rate of each group is computed once, then all entries are created
+        with one create and posted together.
+        """
         move_obj = self.env["account.move"]
-        move_line_obj = self.env["account.move.line"]
-        for fees in self:
-            if not fees.journal_id.sequence_id:
-                raise ValidationError(
-                    _(
-                        "Please define sequence on the journal related to "
-                        "this invoice."
-                    )
-                )
-            # field 'centralisation' from account.journal
-            #  is deprecated field since v9
-            if fees.move_id:
-                continue
-            ctx = self._context.copy()
-            ctx.update({"lang": fees.student_id.lang})
-            if not fees.payment_date:
-                self.write([fees.id], {"payment_date": fields.Date.today()})
-            company_currency = fees.company_id.currency_id.id
-            diff_currency_p = fees.currency_id.id != company_currency
-            current_currency = (
-                fees.currency_id and fees.currency_id.id or company_currency
+        fees_to_post = self.filtered(lambda fees: not fees.move_id)
+        for fees in fees_to_post:
+            if not fees.journal_id:
+                raise ValidationError(_("Kindly, Select Account Journal!"))
+        if not fees_to_post:
+            return move_obj
+        fees_to_post.filtered(lambda fees: not fees.payment_date).write(
+            {"payment_date": fields.Date.today()}
+        )
+        batches = {}
+        for fees in fees_to_post:
+            key = (
+                fees.journal_id,
+                fees.currency_id or fees.company_id.currency_id,
+                fees.payment_date,
             )
-            account_id = False
-            comapny_ac_id = False
-            if fees.type in ("in_invoice", "out_refund"):
-                account_id = fees.student_id.property_account_payable.id
-                cmpy_id = fees.company_id.partner_id
-                comapny_ac_id = cmpy_id.property_account_receivable.id
-            elif fees.type in ("out_invoice", "in_refund"):
-                account_id = fees.student_id.property_account_receivable.id
-                cmp_id = fees.company_id.partner_id
-                comapny_ac_id = cmp_id.property_account_payable.id
-            move = {
-                "ref": fees.name,
-                "journal_id": fees.journal_id.id,
-                "date": fees.payment_date or fields.Date.today(),
-            }
-            ctx.update({"company_id": fees.company_id.id})
-            move_id = move_obj.create(move)
-            context_multi_currency = self._context.copy()
-            context_multi_currency.update({"date": fields.Date.today()})
-            debit = 0.0
-            credit = 0.0
-            if fees.type in ("in_invoice", "out_refund"):
-                # compute method from res.currency is deprecated
-                #    since v12 and replaced with _convert
-                credit = cur_obj._convert(
-                    fees.total, company_currency, fees.company_id, self.date
-                )
-            elif fees.type in ("out_invoice", "in_refund"):
-                debit = cur_obj._convert(
-                    fees.total, company_currency, fees.company_id, self.date
+            batches.setdefault(key, self.browse())
+            batches[key] |= fees
+        move_vals_list = []
+        fees_list = self.browse()
+        for (journal, currency, date), batch in batches.items():
+            # Rate of the batch, the company is the same for a journal
+            rate = currency._convert(
+                1.0,
+                journal.company_id.currency_id,
+                journal.company_id,
+                date,
+                round=False,
+            )
+            for fees in batch:
+                move_vals_list.append(
+                    {
+                        "ref": fees.name,
+                        "journal_id": journal.id,
+                        "date": date,
+                        "line_ids": fees._get_move_line_vals(rate),
+                    }
                 )
-            if debit < 0:
-                credit = -debit
-                debit = 0.0
-            if credit < 0:
-                debit = -credit
-                credit = 0.0
-            sign = debit - credit < 0 and -1 or 1
-            cr_id = diff_currency_p and current_currency or False
-            am_cr = diff_currency_p and sign * fees.total or 0.0
-            date = fees.payment_date or fields.Date.today()
-            move_line = {
-                "name": fees.name or "/",
-                "move_id": move_id,
-                "debit": debit,
-                "credit": credit,
-                "account_id": account_id,
-                "journal_id": fees.journal_id.id,
-                "parent_id": fees.student_id.parent_id.id,
-                "currency_id": cr_id,
-                "amount_currency": am_cr,
-                "date": date,
-            }
-            move_line_obj.create(move_line)
-            cr_id = diff_currency_p and current_currency or False
-            move_line = {
-                "name": fees.name or "/",
-                "move_id": move_id,
-                "debit": credit,
-                "credit": debit,
-                "account_id": comapny_ac_id,
-                "journal_id": fees.journal_id.id,
-                "parent_id": fees.student_id.parent_id.id,
-                "currency_id": cr_id,
-                "amount_currency": am_cr,
-                "date": date,
-            }
-            move_line_obj.create(move_line)
-            fees.write({"move_id": move_id})
-            move_obj.action_post([move_id])
+                fees_list |= fees
+        moves = move_obj.create(move_vals_list)
+        for fees, move in zip(fees_list, moves):
+            fees.move_id = move
+        moves.action_post()
+        return moves
 
     def student_pay_fees(self):
-        """Generate invoice of student fee"""
+        """Generate invoices of student fees in one batch"""
         sequence_obj = self.env["ir.sequence"]
+        default_accounts = {}
+        invoice_vals_list = []
         for rec in self:
             if rec.number == "/":
                 rec.number = sequence_obj.next_by_code("student.payslip") or _(
                     "New"
                 )
-            rec.state = "pending"
+            #     replaced / deprecated fields of v13:
+            #     default_debit_account_id,
+            #     default_credit_account_id from account.journal
+            journal = rec.journal_id
+            if journal not in default_accounts:
+                default_accounts[journal] = journal.default_account_id.id
             partner = rec.student_id and rec.student_id.partner_id
-            vals = {
-                "partner_id": partner.id,
-                "invoice_date": rec.date,
-                "journal_id": rec.journal_id.id,
-                "name": rec.number,
-                "student_payslip_id": rec.id,
-                "move_type": "out_invoice",
-            }
-            invoice_line = []
-            for line in rec.line_ids:
-                #     replaced / deprecated fields of v13:
-                #     default_debit_account_id,
-                #     default_credit_account_id from account.journal
-                acc_id = rec.journal_id.default_account_id.id
-                if line.account_id.id:
-                    acc_id = line.account_id.id
-                invoice_line_vals = {
-                    "name": line.name,
-                    "product_id": line.product_id.id,
-                    "account_id": acc_id,
-                    "quantity": 1.000,
-                    "price_unit": line.amount,
+            invoice_vals_list.append(
+                {
+                    "partner_id": partner.id,
+                    "invoice_date": rec.date,
+                    "journal_id": journal.id,
+                    "name": rec.number,
+                    "student_payslip_id": rec.id,
+                    "move_type": "out_invoice",
+                    "invoice_line_ids": [
+                        (
+                            0,
+                            0,
+                            {
+                                "name": line.name,
+                                "product_id": line.product_id.id,
+                                "account_id": line.account_id.id
+                                or default_accounts[journal],
+                                "quantity": 1.000,
+                                "price_unit": line.amount,
+                            },
+                        )
+                        for line in rec.line_ids
+                    ],
                 }
-                invoice_line.append((0, 0, invoice_line_vals))
-            vals.update({"invoice_line_ids": invoice_line})
-            # creates invoice
-            account_invoice_id = self.env["account.move"].create(vals)
-            invoice_obj = self.env.ref("account.view_move_form")
+            )
+        self.write({"state": "pending"})
+        # creates invoices
+        invoices = self.env["account.move"].create(invoice_vals_list)
+        if len(invoices) != 1:
             return {
                 "name": _("Pay Fees"),
-                "view_mode": "form",
+                "view_mode": "tree,form",
                 "res_model": "account.move",
-                "view_id": invoice_obj.id,
                 "type": "ir.actions.act_window",
-                "nodestroy": True,
-                "target": "current",
-                "res_id": account_invoice_id.id,
-                "context": {},
+                "domain": [("id", "in", invoices.ids)],
+                "context": {"default_move_type": "out_invoice"},
             }
+        invoice_obj = self.env.ref("account.view_move_form")
+        return {
+            "name": _("Pay Fees"),
+            "view_mode": "form",
+            "res_model": "account.move",
+            "view_id": invoice_obj.id,
+            "type": "ir.actions.act_window",
+            "nodestroy": True,
+            "target": "current",
+            "res_id": invoices.id,
+            "context": {},
+        }
 
 
 class StudentPayslipLineLine(models.Model):
@@ -708,78 +1198,62 @@ class AccountMove(models.Model):
         help="Select student payslip",
     )
 
-
-class AccountPaymentRegister(models.TransientModel):
-    _inherit = "account.payment.register"
-
-    def action_create_payments(self):
-        """
-            Override method to write paid amount in hostel student
-        """
-        res = super(AccountPaymentRegister, self).action_create_payments()
-        invoice = False
+    def _sync_school_payments(self):
+        """Update paid and due amounts of the paid student payslips"""
+        res = super(AccountMove, self)._sync_school_payments()
+        invoices = self.filtered("student_payslip_id")
+        payment_vals = invoices._get_school_payment_vals()
         curr_date = fields.Date.today()
-        for rec in self:
-            if self._context.get("active_model") == "account.move":
-                invoice = self.env["account.move"].browse(
-                    self._context.get("active_ids", [])
-                )
-            vals = {}
-            #        'invoice_ids' deprecated field instead of this
-            #                             used delegation with account_move
-            vals.update({"due_amount": invoice.amount_residual})
-            if invoice.student_payslip_id and invoice.payment_state == "paid":
-                # Calculate paid amount and changes state to paid
-                fees_payment = (
-                    invoice.student_payslip_id.paid_amount + rec.amount
-                )
-                vals.update(
+        for invoice in invoices:
+            vals = payment_vals[invoice.id]
+            slip_vals = {
+                "state": "pending",
+                "paid_amount": vals["paid_amount"],
+                "due_amount": vals["due_amount"],
+            }
+            if vals["paid"]:
+                slip_vals.update(
                     {
                         "state": "paid",
                         "payment_date": curr_date,
-                        "move_id": invoice.id or False,
-                        "paid_amount": fees_payment,
-                        "due_amount": invoice.amount_residual,
+                        "move_id": invoice.id,
                     }
                 )
-            if (
-                invoice.student_payslip_id
-                and invoice.payment_state == "not_paid"
-            ):
-                # Calculate paid amount and due amount and changes state
-                # to pending
-                fees_payment = (
-                    invoice.student_payslip_id.paid_amount + rec.amount
-                )
-                vals.update(
-                    {
-                        "state": "pending",
-                        "due_amount": invoice.amount_residual,
-                        "paid_amount": fees_payment,
-                    }
-                )
-            invoice.student_payslip_id.write(vals)
+            invoice.student_payslip_id.write(slip_vals)
         return res
 
 
+class StudentDuesSummary(models.Model):
+    _inherit = "student.dues.summary"
+
+    @api.model
+    def _get_dues_queries(self):
+        """Inherited method to add the dues of student payslips"""
+        queries = super(StudentDuesSummary, self)._get_dues_queries()
+        queries.append(
+            """
+            SELECT
+                student_id, date AS due_date, due_amount AS amount
+            FROM
+                student_payslip
+            WHERE
+                state IN ('confirm', 'pending')
+            """
+        )
+        return queries
+
+
 class StudentFees(models.Model):
     _inherit = "student.student"
 
     def set_alumni(self):
         """Override method to raise warning when fees payment of student is
         remaining when student set to alumni state"""
-        student_payslip_obj = self.env["student.payslip"]
-        for rec in self:
-            if student_payslip_obj.search(
-                [
-                    ("student_id", "=", rec.id),
-                    ("state", "in", ["confirm", "pending"]),
-                ]
-            ):
-                raise ValidationError(
-                    _(
-                        "You cannot alumni student because payment of fees "
-                        "of student is remaining!"
-                    )
+        if self.env["student.dues.summary"]._get_students_with_dues(self.ids):
+            raise ValidationError(
+                _(
+                    "You cannot alumni student because payment of fees "
+                    "of student is remaining!"
                 )
-            return super(StudentFees, self).set_alumni()
+            )
+        return super(StudentFees, self).set_alumni()
@@ -11,6 +11,14 @@ class ReportStudentFeesRegister(models.AbstractModel):
         """Method to get month"""
         return indate.strftime("%B") + "-" + indate.strftime("%Y")
 
+    def get_lines(self, register, data=None):
+        """Method to get the payslips of the register printed in a part"""
+        slip_ids = (data or {}).get("slip_ids")
+        if slip_ids is None:
+            return register.line_ids
+        slip_ids = set(slip_ids)
+        return register.line_ids.filtered(lambda slip: slip.id in slip_ids)
+
     @api.model
     def _get_report_values(self, docids, data=None):
         """Inherited method to get report data"""
@@ -26,4 +34,5 @@ class ReportStudentFeesRegister(models.AbstractModel):
             "docs": students_rec,
             "data": data,
             "get_month": self.get_month,
+            "get_lines": lambda register: self.get_lines(register, data),
         }
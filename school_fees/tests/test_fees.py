@@ -1,9 +1,13 @@
 # See LICENSE file for full copyright and licensing details.
 
-from datetime import datetime
+import logging
+import time
+from datetime import datetime, timedelta
 
 from odoo.tests import common
 
+_logger = logging.getLogger(__name__)
+
 
 class TestFees(common.TransactionCase):
     def setUp(self):
@@ -84,3 +88,91 @@ class TestFees(common.TransactionCase):
 
     def test_fees(self):
         self.assertEqual(self.student.state, "done")
+
+    def test_action_move_create_batch(self):
+        """Journal entries of many payslips are created and posted at once"""
+        start_date = datetime(2017, 1, 1)
+        payslips = self.student_payslip_obj.create(
+            [
+                {
+                    "student_id": self.student.id,
+                    "name": "Batch Fees %s" % index,
+                    "date": start_date + timedelta(days=index),
+                    "payment_date": start_date + timedelta(days=index % 5),
+                    "journal_id": self.journal.id,
+                    "total": 100.0 + index,
+                }
+                for index in range(200)
+            ]
+        )
+        start = time.time()
+        moves = payslips.action_move_create()
+        duration = time.time() - start
+        _logger.info(
+            "Posted %s fee entries in %.2fs (%.0f entries/s)",
+            len(moves),
+            duration,
+            len(moves) / (duration or 1),
+        )
+        self.assertEqual(len(moves), 200)
+        self.assertEqual(payslips.mapped("move_id"), moves)
+        self.assertEqual(set(moves.mapped("state")), {"posted"})
+
+    def test_fees_rules(self):
+        """Fee rules of the structure are applied when pricing payslips"""
+        self.fees_structure.write(
+            {
+                "rule_ids": [
+                    (
+                        0,
+                        0,
+                        {
+                            "name": "Class Fees",
+                            "rule_type": "override",
+                            "amount_type": "fixed",
+                            "value": 3000.0,
+                            "standard_ids": [
+                                (6, 0, self.student.standard_id.ids)
+                            ],
+                        },
+                    ),
+                    (
+                        0,
+                        0,
+                        {
+                            "name": "Merit Scholarship",
+                            "sequence": 20,
+                            "rule_type": "scholarship",
+                            "amount_type": "percent",
+                            "value": 50.0,
+                            "student_ids": [(6, 0, self.student.ids)],
+                        },
+                    ),
+                ]
+            }
+        )
+        payslip = self.student_payslip_obj.create(
+            {
+                "student_id": self.student.id,
+                "name": "Scholarship Fees",
+                "date": "2018-01-01",
+                "fees_structure_id": self.fees_structure.id,
+                "journal_id": self.journal.id,
+            }
+        )
+        payslip.payslip_confirm()
+        self.assertEqual(payslip.line_ids.amount, 1500.0)
+        self.assertEqual(payslip.total, 1500.0)
+
+    def test_fees_register_totals(self):
+        """Register totals are stored from the payslips of the register"""
+        payslips = self.fees_register.line_ids
+        self.assertEqual(
+            self.fees_register.total_amount, sum(payslips.mapped("total"))
+        )
+        self.assertEqual(self.fees_register.draft_count, len(payslips))
+        payslips.payslip_confirm()
+        self.assertEqual(self.fees_register.confirm_count, len(payslips))
+        self.assertEqual(
+            self.fees_register.due_amount, sum(payslips.mapped("due_amount"))
+        )
@@ -319,7 +319,20 @@ class HostelStudent(models.Model):
             duration_months = vals.get("duration") or self.duration
             discharge_date = addmissiondate + rd(months=duration_months)
             vals.update({"discharge_date": discharge_date})
-        return super(HostelStudent, self).write(vals)
+        students = self.mapped("student_id")
+        res = super(HostelStudent, self).write(vals)
+        if not self._context.get("defer_dues_refresh") and set(vals) & {
+            "status",
+            "paid_amount",
+            "duration",
+            "admission_date",
+            "room_id",
+            "student_id",
+        }:
+            self.env["student.dues.summary"]._refresh_dues(
+                (students | self.mapped("student_id")).ids
+            )
+        return res
 
     def unlink(self):
         """Inherited unlink method to make check state at record deletion"""
@@ -452,37 +465,45 @@ class AccountMove(models.Model):
         "Hostel Fees Reference", help="Hostel Fee Reference"
     )
 
+    def _sync_school_payments(self):
+        """Update paid amount and status of the paid hostel students"""
+        res = super(AccountMove, self)._sync_school_payments()
+        invoices = self.filtered("hostel_student_id")
+        payment_vals = invoices._get_school_payment_vals()
+        for invoice in invoices:
+            vals = payment_vals[invoice.id]
+            invoice.hostel_student_id.write(
+                {
+                    "status": vals["paid"] and "paid" or "pending",
+                    "paid_amount": vals["paid_amount"],
+                }
+            )
+        return res
 
-class AccountPaymentRegister(models.TransientModel):
-    _inherit = "account.payment.register"
 
-    def action_create_payments(self):
-        """
-            Override method to write paid amount in hostel student
-        """
-        res = super(AccountPaymentRegister, self).action_create_payments()
-        inv = False
-        for rec in self:
-            if self._context.get("active_model") == "account.move":
-                inv = self.env["account.move"].browse(
-                    self._context.get("active_ids", [])
-                )
-            vals = {}
-            if inv.hostel_student_id and inv.payment_state == "paid":
-                fees_payment = inv.hostel_student_id.paid_amount + rec.amount
-                vals.update({"status": "paid", "paid_amount": fees_payment})
-                inv.hostel_student_id.write(vals)
-            elif inv.hostel_student_id and inv.payment_state == "not_paid":
-                fees_payment = inv.hostel_student_id.paid_amount + rec.amount
-                vals.update(
-                    {
-                        "status": "pending",
-                        "paid_amount": fees_payment,
-                        "remaining_amount": inv.amount_residual,
-                    }
-                )
-            inv.hostel_student_id.write(vals)
-        return res
+class StudentDuesSummary(models.Model):
+    _inherit = "student.dues.summary"
+
+    @api.model
+    def _get_dues_queries(self):
+        """Inherited method to add the dues of hostel students"""
+        queries = super(StudentDuesSummary, self)._get_dues_queries()
+        queries.append(
+            """
+            SELECT
+                hs.student_id,
+                hs.admission_date::date AS due_date,
+                hs.duration * hr.rent_amount - COALESCE(hs.paid_amount, 0)
+                    AS amount
+            FROM
+                hostel_student hs
+                JOIN hostel_room hr ON hr.id = hs.room_id
+            WHERE
+                hs.status = 'pending' AND
+                hs.active
+            """
+        )
+        return queries
 
 
 class Student(models.Model):
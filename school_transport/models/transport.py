@@ -415,6 +415,21 @@ class TransportRegistration(models.Model):
             ret_val.onchange_registration_month()
         return ret_val
 
+    def write(self, vals):
+        """Inherited write method to refresh dues of the students"""
+        students = self.mapped("student_id")
+        res = super(TransportRegistration, self).write(vals)
+        if not self._context.get("defer_dues_refresh") and set(vals) & {
+            "state",
+            "remain_amt",
+            "reg_date",
+            "student_id",
+        }:
+            self.env["student.dues.summary"]._refresh_dues(
+                (students | self.mapped("student_id")).ids
+            )
+        return res
+
     def unlink(self):
         """Inherited method to check state at record deletion"""
         for rec in self:
@@ -608,49 +623,38 @@ class AccountInvoice(models.Model):
         help="Transport records",
     )
 
+    def _sync_school_payments(self):
+        """Update paid and due amounts of the paid transport registrations"""
+        res = super(AccountInvoice, self)._sync_school_payments()
+        invoices = self.filtered("transport_student_id")
+        payment_vals = invoices._get_school_payment_vals()
+        for invoice in invoices:
+            vals = payment_vals[invoice.id]
+            invoice.transport_student_id.write(
+                {
+                    "state": vals["paid"] and "paid" or "pending",
+                    "paid_amount": vals["paid_amount"],
+                    "remain_amt": vals["due_amount"],
+                }
+            )
+        return res
 
-class AccountPaymentRegister(models.TransientModel):
-    _inherit = "account.payment.register"
 
-    def action_create_payments(self):
-        """
-            Override method to write paid amount in hostel student
-        """
-        res = super(AccountPaymentRegister, self).action_create_payments()
-        invoice = False
-        for rec in self:
-            if self._context.get("active_model") == "account.move":
-                invoice = self.env["account.move"].browse(
-                    self._context.get("active_ids", [])
-                )
-            vals = {}
-            if (
-                invoice.transport_student_id
-                and invoice.payment_state == "paid"
-            ):
-                fees_payment = (
-                    invoice.transport_student_id.paid_amount + rec.amount
-                )
-                vals.update(
-                    {
-                        "state": "paid",
-                        "paid_amount": fees_payment,
-                        "remain_amt": 0.0,
-                    }
-                )
-            elif (
-                invoice.transport_student_id
-                and invoice.payment_state == "partial"
-            ):
-                fees_payment = (
-                    invoice.transport_student_id.paid_amount + rec.amount
-                )
-                vals.update(
-                    {
-                        "state": "pending",
-                        "paid_amount": fees_payment,
-                        "remain_amt": invoice.amount_residual,
-                    }
-                )
-            invoice.transport_student_id.write(vals)
-        return res
+class StudentDuesSummary(models.Model):
+    _inherit = "student.dues.summary"
+
+    @api.model
+    def _get_dues_queries(self):
+        """Inherited method to add the dues of transport registrations"""
+        queries = super(StudentDuesSummary, self)._get_dues_queries()
+        queries.append(
+            """
+            SELECT
+                student_id, reg_date AS due_date, remain_amt AS amount
+            FROM
+                transport_registration
+            WHERE
+                state IN ('confirm', 'pending')
+            """
+        )
+        return queries
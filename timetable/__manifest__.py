@@ -17,6 +17,7 @@
         "report/report_view.xml",
         "report/timetable.xml",
         "views/timetable_view.xml",
+        "wizard/timetable_generate_view.xml",
     ],
     "demo": ["demo/timetable_demo.xml"],
     "installable": True,
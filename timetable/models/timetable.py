@@ -2,6 +2,7 @@
 
 from odoo import _, api, fields, models
 from odoo.exceptions import ValidationError
+from odoo.tools.sql import create_index
 
 
 class TimeTable(models.Model):
@@ -58,34 +59,16 @@ class TimeTable(models.Model):
     @api.constrains("timetable_ids")
     def _check_lecture(self):
         """Method to check same lecture is not assigned on same day."""
-        if self.timetable_type == "regular":
-            line_ids = self.env["time.table.line"].search(
-                [("table_id", "in", self.ids)]
-            )
-            for rec in line_ids:
-                records = [
-                    rec_check.id
-                    for rec_check in line_ids
-                    if (
-                        rec.week_day == rec_check.week_day
-                        and rec.start_time == rec_check.start_time
-                        and rec.end_time == rec_check.end_time
-                        and rec.teacher_id.id == rec.teacher_id.id
-                    )
-                ]
-                if len(records) > 1:
-                    raise ValidationError(
-                        _(
-                            "You cannot set lecture at same time %s  at same "
-                            "day %s for teacher %s.!"
-                        )
-                        % (rec.start_time, rec.week_day, rec.teacher_id.name)
-                    )
-                # Checks if time is greater than 24 hours than raise error
-                if rec.start_time > 24 or rec.end_time > 24:
-                    raise ValidationError(
-                        _("Start and End Time should be less than 24 hours!")
-                    )
+        regular_tables = self.filtered(
+            lambda t: t.timetable_type == "regular"
+        )
+        for rec in regular_tables.mapped("timetable_ids"):
+            # Checks if time is greater than 24 hours than raise error
+            if rec.start_time > 24 or rec.end_time > 24:
+                raise ValidationError(
+                    _("Start and End Time should be less than 24 hours!")
+                )
+        regular_tables.mapped("timetable_ids")._check_lecture_clashes()
 
 
 class TimeTableLine(models.Model):
@@ -173,36 +156,121 @@ class TimeTableLine(models.Model):
             ):
                 raise ValidationError(_("Time should not overlap!"))
 
-    @api.constrains("teacher_id", "class_room_id")
+    def init(self):
+        """Create the weekly slot index used by the clash detection"""
+        create_index(
+            self._cr,
+            "time_table_line_week_day_time_index",
+            self._table,
+            ["week_day", "start_time", "end_time"],
+        )
+
+    def _get_lecture_clashes(self):
+        """Return all teacher and room double bookings of the current lines.
+
+        Lines are compared with every other regular timetable line of the
+        same academic year through a single overlap query. Each clash is a
+        dict with the clashing ``line_id`` and ``other_id`` and whether the
+        ``teacher`` and/or the ``room`` is double booked.
+        """
+        if not self.ids:
+            return []
+        self.flush(
+            [
+                "table_id",
+                "week_day",
+                "start_time",
+                "end_time",
+                "teacher_id",
+                "class_room_id",
+            ]
+        )
+        self.env["time.table"].flush(["timetable_type", "year_id"])
+        self._cr.execute(
+            """
+            SELECT
+                l.id,
+                o.id,
+                COALESCE(l.teacher_id = o.teacher_id, False),
+                COALESCE(l.class_room_id = o.class_room_id, False)
+            FROM
+                time_table_line l
+                JOIN time_table lt ON lt.id = l.table_id
+                JOIN time_table_line o ON (
+                    o.id != l.id AND
+                    o.week_day = l.week_day AND
+                    o.start_time < l.end_time AND
+                    o.end_time > l.start_time
+                )
+                JOIN time_table ot ON ot.id = o.table_id
+            WHERE
+                l.id IN %(ids)s AND
+                lt.timetable_type = 'regular' AND
+                ot.timetable_type = 'regular' AND
+                ot.year_id = lt.year_id AND
+                (o.teacher_id = l.teacher_id OR
+                 o.class_room_id = l.class_room_id) AND
+                (o.id NOT IN %(ids)s OR o.id > l.id)
+            ORDER BY l.id, o.id
+            """,
+            {"ids": tuple(self.ids)},
+        )
+        return [
+            {
+                "line_id": line_id,
+                "other_id": other_id,
+                "teacher": teacher,
+                "room": room,
+            }
+            for line_id, other_id, teacher, room in self._cr.fetchall()
+        ]
+
+    def _check_lecture_clashes(self):
+        """Raise one error listing all the clashes of the lines"""
+        messages = []
+        for clash in self._get_lecture_clashes():
+            line = self.browse(clash["line_id"])
+            other = self.browse(clash["other_id"])
+            if clash["teacher"]:
+                messages.append(
+                    _("Lecturer %s has lectures of %s and %s on %s at %s!")
+                    % (
+                        line.teacher_id.name,
+                        line.table_id.name,
+                        other.table_id.name,
+                        line.week_day,
+                        line.start_time,
+                    )
+                )
+            if clash["room"]:
+                messages.append(
+                    _("The room %s is occupied by %s on %s at %s!")
+                    % (
+                        line.class_room_id.name,
+                        other.table_id.name,
+                        line.week_day,
+                        other.start_time,
+                    )
+                )
+        if messages:
+            raise ValidationError("\n".join(messages))
+
+    @api.constrains(
+        "teacher_id", "class_room_id", "week_day", "start_time", "end_time"
+    )
     def check_teacher_room(self):
         """Check available room for teacher."""
-        for rec in self:
-            for data in self.env["time.table"].search(
-                [("id", "!=", rec.table_id.id)]
-            ):
-                for record in data.timetable_ids:
-                    if (
-                        data.timetable_type == "regular"
-                        and rec.table_id.timetable_type == "regular"
-                        and rec.teacher_id == record.teacher_id
-                        and rec.week_day == record.week_day
-                        and rec.start_time == record.start_time
-                    ):
-                        raise ValidationError(
-                            _("There is a lecture of Lecturer at same time!")
-                        )
-                    if (
-                        data.timetable_type == "regular"
-                        and rec.table_id.timetable_type == "regular"
-                        and rec.class_room_id == record.class_room_id
-                        and rec.start_time == record.start_time
-                    ):
-                        raise ValidationError(_("The room is occupied."))
+        self._check_lecture_clashes()
 
 
 class SubjectSubject(models.Model):
     _inherit = "subject.subject"
 
+    weekly_periods = fields.Integer(
+        "Weekly Periods",
+        help="Number of lectures of the subject in a week",
+    )
+
     @api.model
     def _search(
         self,
@@ -1,54 +1,104 @@
 # See LICENSE file for full copyright and licensing details.
 
-from odoo import api, models
+from odoo import api, models, tools
 
 
 class ReportTimetableInfo(models.AbstractModel):
     _name = "report.timetable.timetable"
     _description = "Timetable details"
 
-    def _get_timetable(self, timetable_id):
-        """Method to combain values for timetable"""
-        timetable_detail = []
+    @tools.ormcache("timetable_id", "version")
+    def _get_timetable_grid(self, timetable_id, version):
+        """Return the (slot x weekday) grid of a timetable.
+
+        The grid is pivoted by a single query and cached on the timetable
+        id and version, so it is only rebuilt once the timetable changes.
+        """
         self._cr.execute(
-            """select t.start_time,t.end_time,s.name,week_day,
-                        st.employee_id, hr.name as
-                        teacher from time_table_line t,
-                        subject_subject s, resource_resource r, school_teacher
-                        st, hr_employee
-                        hr where t.subject_id= s.id and t.teacher_id=st.id and
-                        st.employee_id= hr.id
-                        and  t.table_id = %s
-                        group by start_time,end_time,s.name,week_day,
-                        st.employee_id,hr.name
-                        order by start_time""",
-            tuple([timetable_id.id]),
+            """
+            SELECT
+                start_time,
+                end_time,
+                STRING_AGG(cell, E'\\n' ORDER BY line_id) FILTER (
+                    WHERE week_day = 'monday') AS monday,
+                STRING_AGG(cell, E'\\n' ORDER BY line_id) FILTER (
+                    WHERE week_day = 'tuesday') AS tuesday,
+                STRING_AGG(cell, E'\\n' ORDER BY line_id) FILTER (
+                    WHERE week_day = 'wednesday') AS wednesday,
+                STRING_AGG(cell, E'\\n' ORDER BY line_id) FILTER (
+                    WHERE week_day = 'thursday') AS thursday,
+                STRING_AGG(cell, E'\\n' ORDER BY line_id) FILTER (
+                    WHERE week_day = 'friday') AS friday,
+                STRING_AGG(cell, E'\\n' ORDER BY line_id) FILTER (
+                    WHERE week_day = 'saturday') AS saturday,
+                STRING_AGG(cell, E'\\n' ORDER BY line_id) FILTER (
+                    WHERE week_day = 'sunday') AS sunday
+            FROM (
+                SELECT
+                    t.id AS line_id,
+                    t.start_time,
+                    t.end_time,
+                    t.week_day,
+                    CASE
+                        WHEN s.name = 'Recess' OR hr.name IS NULL
+                        THEN s.name
+                        ELSE s.name || E'\\n(' || hr.name || ')'
+                    END AS cell
+                FROM
+                    time_table_line t
+                    LEFT JOIN subject_subject s ON s.id = t.subject_id
+                    LEFT JOIN school_teacher st ON st.id = t.teacher_id
+                    LEFT JOIN hr_employee hr ON hr.id = st.employee_id
+                WHERE
+                    t.table_id = %s
+            ) AS timetable_cell
+            GROUP BY start_time, end_time
+            ORDER BY start_time, end_time
+            """,
+            (timetable_id,),
         )
-        res = self._cr.dictfetchall()
+        return tuple(self._cr.dictfetchall())
+
+    def _get_timetable_version(self, timetable_id):
+        """Return the last change of a timetable, its lines and the subject
+        and teacher names shown in its cells"""
         self._cr.execute(
-            """select start_time,end_time from time_table_line
-                        where table_id=%s group by start_time,end_time
-                        order by start_time""",
-            tuple([timetable_id.id]),
+            """
+            SELECT
+                GREATEST(
+                    tt.write_date,
+                    MAX(t.write_date),
+                    MAX(s.write_date),
+                    MAX(st.write_date),
+                    MAX(hr.write_date)
+                ),
+                COUNT(t.id)
+            FROM
+                time_table tt
+                LEFT JOIN time_table_line t ON t.table_id = tt.id
+                LEFT JOIN subject_subject s ON s.id = t.subject_id
+                LEFT JOIN school_teacher st ON st.id = t.teacher_id
+                LEFT JOIN hr_employee hr ON hr.id = st.employee_id
+            WHERE
+                tt.id = %s
+            GROUP BY tt.write_date
+            """,
+            (timetable_id,),
         )
-        time_data = self._cr.dictfetchall()
-        for time_detail in time_data:
-            for data in res:
-                if (
-                    time_detail.get("start_time") == data.get("start_time")
-                ) and (time_detail.get("end_time") == data.get("end_time")):
-                    if data.get("name") == "Recess":
-                        time_detail[data["week_day"]] = data.get("name")
-                    else:
-                        td = (
-                            data.get("name")
-                            + "\n("
-                            + data.get("teacher")
-                            + ")"
-                        )
-                        time_detail[data["week_day"]] = td
-            timetable_detail.append(time_detail)
-        return timetable_detail
+        return self._cr.fetchone()
+
+    def _get_timetable(self, timetable_id):
+        """Method to combain values for timetable"""
+        self.env["time.table"].flush()
+        self.env["time.table.line"].flush()
+        self.env["subject.subject"].flush(["name"])
+        self.env["hr.employee"].flush(["name"])
+        return [
+            dict(time_detail)
+            for time_detail in self._get_timetable_grid(
+                timetable_id.id, self._get_timetable_version(timetable_id.id)
+            )
+        ]
 
     @api.model
     def _get_report_values(self, docids, data=None):
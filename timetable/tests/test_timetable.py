@@ -1,7 +1,14 @@
 # See LICENSE file for full copyright and licensing details.
 
+import time
+
 from odoo.tests import common
 
+from odoo.addons.timetable.wizard.timetable_solver import (
+    Lesson,
+    TimetableSolver,
+)
+
 
 class TestTimetable(common.TransactionCase):
     def setUp(self):
@@ -38,3 +45,36 @@ class TestTimetable(common.TransactionCase):
 
     def test_timetable(self):
         self.assertIn(self.subject_id, self.teacher_id.subject_id)
+
+    def test_timetable_solver_benchmark(self):
+        """Synthetic school of 60 classes is scheduled clash free"""
+        slots = [
+            (day, 8.0 + period, 9.0 + period)
+            for day in ["monday", "tuesday", "wednesday", "thursday", "friday"]
+            for period in range(7)
+        ]
+        periods = [5, 5, 5, 4, 4, 3, 3, 3]
+        lessons = []
+        for group in range(60):
+            for subject, count in enumerate(periods):
+                teachers = tuple(
+                    "teacher-%s-%s" % (subject, no) for no in range(11)
+                )
+                lesson = Lesson(group, subject, teachers, ("room-%s" % group,))
+                lessons.extend([lesson] * count)
+        start = time.time()
+        assignments, unplaced = TimetableSolver(
+            slots, lessons, time_budget=30, seed=1
+        ).solve()
+        self.assertLess(time.time() - start, 30)
+        self.assertFalse(unplaced)
+        booked = set()
+        for assignment in assignments:
+            group = lessons[assignment.lesson].group
+            for key in [
+                ("group", group, assignment.slot),
+                ("teacher", assignment.teacher, assignment.slot),
+                ("room", assignment.room, assignment.slot),
+            ]:
+                self.assertNotIn(key, booked)
+                booked.add(key)
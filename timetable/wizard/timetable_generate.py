@@ -0,0 +1,219 @@
+# See LICENSE file for full copyright and licensing details.
+
+from odoo import _, api, fields, models
+from odoo.exceptions import ValidationError
+
+from .timetable_solver import Lesson, TimetableSolver
+
+WEEK_DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday"]
+
+
+class TimetableGenerate(models.TransientModel):
+    """Generate clash-free regular timetables for several standards."""
+
+    _name = "timetable.generate"
+    _description = "Generate Timetable"
+
+    year_id = fields.Many2one(
+        "academic.year",
+        "Year",
+        required=True,
+        help="Academic year of the generated timetables",
+    )
+    standard_ids = fields.Many2many(
+        "school.standard",
+        string="Academic Classes",
+        required=True,
+        help="Standards for which timetables are generated",
+    )
+    class_room_ids = fields.Many2many(
+        "class.room",
+        string="Class Rooms",
+        help="Rooms used for standards without their own class room",
+    )
+    day_start = fields.Float(
+        "Day Start", default=8.0, help="Start time of the first period"
+    )
+    period_duration = fields.Float(
+        "Period Duration", default=1.0, help="Duration of one period in hours"
+    )
+    periods_per_day = fields.Integer(
+        "Periods Per Day", default=7, help="Number of periods in a day"
+    )
+    include_saturday = fields.Boolean(
+        "Include Saturday", help="Schedule lectures on saturday as well"
+    )
+    default_periods = fields.Integer(
+        "Default Weekly Periods",
+        default=4,
+        help="Weekly periods of subjects without their own weekly periods",
+    )
+    time_budget = fields.Integer(
+        "Time Budget (Seconds)",
+        default=30,
+        help="Maximum time spent searching for a timetable",
+    )
+    replace_existing = fields.Boolean(
+        "Replace Existing",
+        help="Delete existing regular timetables of the selected standards",
+    )
+
+    @api.constrains("period_duration", "periods_per_day", "day_start")
+    def check_periods(self):
+        """Method to check the periods fit in a day."""
+        for rec in self:
+            if rec.period_duration <= 0 or rec.periods_per_day <= 0:
+                raise ValidationError(
+                    _("Periods and their duration should be greater than 0!")
+                )
+            if rec.day_start + rec.period_duration * rec.periods_per_day > 24:
+                raise ValidationError(
+                    _("Start and End Time should be less than 24 hours!")
+                )
+
+    def _get_slots(self):
+        """Return the ``(week_day, start_time, end_time)`` slots of a week"""
+        self.ensure_one()
+        week_days = WEEK_DAYS + (self.include_saturday and ["saturday"] or [])
+        return [
+            (
+                day,
+                self.day_start + period * self.period_duration,
+                self.day_start + (period + 1) * self.period_duration,
+            )
+            for day in week_days
+            for period in range(self.periods_per_day)
+        ]
+
+    def _get_lessons(self):
+        """Expand subjects of the standards into weekly lessons"""
+        self.ensure_one()
+        lessons = []
+        for standard in self.standard_ids:
+            rooms = standard.class_room_id or self.class_room_ids
+            if not rooms:
+                raise ValidationError(
+                    _("Please select class rooms for standard %s!")
+                    % (standard.display_name)
+                )
+            for subject in standard.subject_ids:
+                if not subject.teacher_ids:
+                    raise ValidationError(
+                        _("The subject %s is not assigned to any teacher.")
+                        % (subject.name)
+                    )
+                lesson = Lesson(
+                    standard.id,
+                    subject.id,
+                    tuple(subject.teacher_ids.ids),
+                    tuple(rooms.ids),
+                )
+                periods = subject.weekly_periods or self.default_periods
+                lessons.extend([lesson] * periods)
+        return lessons
+
+    def _get_busy_slots(self, slots):
+        """Return teachers and rooms already booked by other timetables"""
+        self.ensure_one()
+        busy_teachers = set()
+        busy_rooms = set()
+        lines = self.env["time.table.line"].search_read(
+            [
+                ("table_id.timetable_type", "=", "regular"),
+                ("table_id.year_id", "=", self.year_id.id),
+                ("table_id.standard_id", "not in", self.standard_ids.ids),
+            ],
+            [
+                "week_day",
+                "start_time",
+                "end_time",
+                "teacher_id",
+                "class_room_id",
+            ],
+        )
+        for line in lines:
+            for slot in slots:
+                if (
+                    slot[0] == line["week_day"]
+                    and slot[1] < line["end_time"]
+                    and slot[2] > line["start_time"]
+                ):
+                    if line["teacher_id"]:
+                        busy_teachers.add((line["teacher_id"][0], slot))
+                    if line["class_room_id"]:
+                        busy_rooms.add((line["class_room_id"][0], slot))
+        return busy_teachers, busy_rooms
+
+    def generate_timetable(self):
+        """Method to generate regular timetables of the standards"""
+        self.ensure_one()
+        timetable_obj = self.env["time.table"]
+        existing = timetable_obj.search(
+            [
+                ("timetable_type", "=", "regular"),
+                ("year_id", "=", self.year_id.id),
+                ("standard_id", "in", self.standard_ids.ids),
+            ]
+        )
+        if existing and not self.replace_existing:
+            raise ValidationError(
+                _("Timetables already exist for %s!")
+                % (", ".join(existing.mapped("standard_id.display_name")))
+            )
+        slots = self._get_slots()
+        lessons = self._get_lessons()
+        busy_teachers, busy_rooms = self._get_busy_slots(slots)
+        assignments, unplaced = TimetableSolver(
+            slots,
+            lessons,
+            busy_teachers=busy_teachers,
+            busy_rooms=busy_rooms,
+            time_budget=self.time_budget,
+        ).solve()
+        if unplaced:
+            raise ValidationError(
+                _(
+                    "%s lectures could not be scheduled without a clash! "
+                    "Add teachers, class rooms or periods, or increase the "
+                    "time budget."
+                )
+                % (len(unplaced))
+            )
+        existing.unlink()
+        lines_by_standard = {standard.id: [] for standard in self.standard_ids}
+        for assignment in assignments:
+            lesson = lessons[assignment.lesson]
+            week_day, start_time, end_time = assignment.slot
+            lines_by_standard[lesson.group].append(
+                (
+                    0,
+                    0,
+                    {
+                        "week_day": week_day,
+                        "start_time": start_time,
+                        "end_time": end_time,
+                        "subject_id": lesson.subject,
+                        "teacher_id": assignment.teacher,
+                        "class_room_id": assignment.room,
+                    },
+                )
+            )
+        timetables = timetable_obj.create(
+            [
+                {
+                    "name": _("%s Timetable") % (standard.display_name),
+                    "standard_id": standard.id,
+                    "year_id": self.year_id.id,
+                    "timetable_type": "regular",
+                    "timetable_ids": lines_by_standard[standard.id],
+                }
+                for standard in self.standard_ids
+            ]
+        )
+        return {
+            "name": _("Regular Timetable"),
+            "view_mode": "tree,form",
+            "res_model": "time.table",
+            "type": "ir.actions.act_window",
+            "domain": [("id", "in", timetables.ids)],
+        }
@@ -0,0 +1,205 @@
+# See LICENSE file for full copyright and licensing details.
+
+import random
+import time
+from collections import defaultdict, namedtuple
+
+# One weekly period to place: the class (group) attending it, its subject and
+# the teachers and rooms allowed to take it.
+Lesson = namedtuple("Lesson", "group subject teachers rooms")
+
+# Placed lesson: index in the lesson list, slot, teacher and room.
+Assignment = namedtuple("Assignment", "lesson slot teacher room")
+
+
+class TimetableSolver(object):
+    """Heuristic search placing weekly lessons into clash-free slots.
+
+    Slots are ``(week_day, start_time, end_time)`` tuples. A class, a
+    teacher and a room can only be used once per slot, a subject keeps the
+    same teacher for a class and is spread over the week. Lessons are
+    placed most constrained first, blocked lessons try to move one placed
+    lesson out of the way and the search restarts with a shuffled order
+    until everything is placed or the time budget is spent. The best
+    attempt is returned.
+    """
+
+    def __init__(
+        self,
+        slots,
+        lessons,
+        busy_teachers=None,
+        busy_rooms=None,
+        time_budget=30.0,
+        seed=None,
+    ):
+        self.slots = list(slots)
+        self.lessons = list(lessons)
+        self.busy_teachers = set(busy_teachers or ())
+        self.busy_rooms = set(busy_rooms or ())
+        self.time_budget = time_budget
+        self.random = random.Random(seed)
+
+    def solve(self):
+        """Return ``(assignments, unplaced_lessons)`` of the best attempt"""
+        deadline = time.time() + self.time_budget
+        order = self._initial_order()
+        best = None
+        while True:
+            assignments, unplaced = self._attempt(order, deadline)
+            if best is None or len(unplaced) < len(best[1]):
+                best = (assignments, unplaced)
+            if not unplaced or time.time() >= deadline:
+                break
+            # Keep the hardest lessons first, but shuffle the rest and move
+            # the lessons which failed to the front of the next attempt.
+            failed = set(unplaced)
+            order = [i for i in order if i in failed] + [
+                i for i in order if i not in failed
+            ]
+            head, tail = order[: len(failed)], order[len(failed) :]
+            self.random.shuffle(tail)
+            order = head + tail
+        return best
+
+    def _initial_order(self):
+        """Order lessons with the fewest options and most periods first"""
+        self.periods = periods = defaultdict(int)
+        for lesson in self.lessons:
+            periods[(lesson.group, lesson.subject)] += 1
+        return sorted(
+            range(len(self.lessons)),
+            key=lambda i: (
+                len(self.lessons[i].teachers) * len(self.lessons[i].rooms),
+                -periods[(self.lessons[i].group, self.lessons[i].subject)],
+                self.random.random(),
+            ),
+        )
+
+    def _attempt(self, order, deadline):
+        """Place the lessons in the given order once"""
+        self._reset()
+        unplaced = []
+        for index in order:
+            if time.time() >= deadline:
+                unplaced.append(index)
+                continue
+            if not self._place(index) and not self._place_with_move(index):
+                unplaced.append(index)
+        return list(self.placed.values()), unplaced
+
+    def _reset(self):
+        self.placed = {}
+        self.group_slots = set()
+        self.teacher_slots = {}
+        self.room_slots = {}
+        self.subject_teacher = {}
+        self.subject_days = defaultdict(int)
+        self.subject_periods = defaultdict(int)
+        self.teacher_load = defaultdict(int)
+
+    def _candidates(self, index, slot):
+        """Return the free ``(teacher, room)`` for a lesson at a slot"""
+        lesson = self.lessons[index]
+        if (lesson.group, slot) in self.group_slots:
+            return None
+        key = (lesson.group, lesson.subject)
+        teachers = (
+            [self.subject_teacher[key]]
+            if key in self.subject_teacher
+            else sorted(lesson.teachers, key=lambda t: self.teacher_load[t])
+        )
+        teacher = next(
+            (
+                t
+                for t in teachers
+                if (t, slot) not in self.teacher_slots
+                and (t, slot) not in self.busy_teachers
+            ),
+            None,
+        )
+        room = next(
+            (
+                r
+                for r in lesson.rooms
+                if (r, slot) not in self.room_slots
+                and (r, slot) not in self.busy_rooms
+            ),
+            None,
+        )
+        if teacher is None or room is None:
+            return None
+        return teacher, room
+
+    def _sorted_slots(self, index):
+        """Prefer days where the class has the fewest periods of the subject"""
+        lesson = self.lessons[index]
+        return sorted(
+            self.slots,
+            key=lambda s: (
+                self.subject_days[(lesson.group, lesson.subject, s[0])],
+                self.random.random(),
+            ),
+        )
+
+    def _place(self, index, exclude_slot=None):
+        for slot in self._sorted_slots(index):
+            if slot == exclude_slot:
+                continue
+            found = self._candidates(index, slot)
+            if found:
+                self._assign(index, slot, *found)
+                return True
+        return False
+
+    def _place_with_move(self, index):
+        """Free a slot by moving one placed lesson blocking the teacher/room"""
+        lesson = self.lessons[index]
+        for slot in self._sorted_slots(index):
+            if (lesson.group, slot) in self.group_slots:
+                continue
+            blockers = {
+                self.teacher_slots.get((teacher, slot))
+                for teacher in lesson.teachers
+            } | {self.room_slots.get((room, slot)) for room in lesson.rooms}
+            for blocker in blockers - {None}:
+                previous = self.placed[blocker]
+                self._unassign(blocker)
+                found = self._candidates(index, slot)
+                if found:
+                    self._assign(index, slot, *found)
+                    if self._place(blocker, exclude_slot=slot):
+                        return True
+                    self._unassign(index)
+                self._assign(
+                    blocker, previous.slot, previous.teacher, previous.room
+                )
+        return False
+
+    def _assign(self, index, slot, teacher, room):
+        lesson = self.lessons[index]
+        self.placed[index] = Assignment(index, slot, teacher, room)
+        self.group_slots.add((lesson.group, slot))
+        self.teacher_slots[(teacher, slot)] = index
+        self.room_slots[(room, slot)] = index
+        key = (lesson.group, lesson.subject)
+        if key not in self.subject_teacher:
+            # The teacher is committed to every period of the subject.
+            self.subject_teacher[key] = teacher
+            self.teacher_load[teacher] += self.periods[key]
+        self.subject_periods[key] += 1
+        self.subject_days[(lesson.group, lesson.subject, slot[0])] += 1
+
+    def _unassign(self, index):
+        lesson = self.lessons[index]
+        assignment = self.placed.pop(index)
+        self.group_slots.discard((lesson.group, assignment.slot))
+        del self.teacher_slots[(assignment.teacher, assignment.slot)]
+        del self.room_slots[(assignment.room, assignment.slot)]
+        key = (lesson.group, lesson.subject, assignment.slot[0])
+        self.subject_days[key] -= 1
+        key = (lesson.group, lesson.subject)
+        self.subject_periods[key] -= 1
+        if not self.subject_periods[key]:
+            del self.subject_teacher[key]
+            self.teacher_load[assignment.teacher] -= self.periods[key]